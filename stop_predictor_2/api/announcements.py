@@ -0,0 +1,80 @@
+# Per-session announcement state so the same stop is announced once per ride,
+# not on every ping from the same rider.
+
+import threading
+import time
+from collections import deque
+
+# Confidence needed for a ping to count towards an announcement
+ANNOUNCE_CONFIDENCE = 0.6
+# Consecutive confident pings predicting the same stop before we announce it
+ANNOUNCE_MIN_PINGS = 2
+# Stops already announced to a session are remembered this many at a time,
+# so flapping between two stops (A, B, A) doesn't announce A twice
+ANNOUNCED_HISTORY = 20
+# Sessions not seen for this long are forgotten
+SESSION_TTL_SECONDS = 30 * 60
+PRUNE_INTERVAL_SECONDS = 60
+
+
+class AnnouncementTracker:
+    """Decides whether a prediction is new enough to be announced for a session"""
+
+    def __init__(self, confidence=ANNOUNCE_CONFIDENCE, min_pings=ANNOUNCE_MIN_PINGS,
+                 ttl_seconds=SESSION_TTL_SECONDS):
+        self.confidence = confidence
+        self.min_pings = min_pings
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def share(self, manager):
+        """Keep sessions in a multiprocessing.Manager, so pre-forked workers see the same riders"""
+        self._sessions = manager.dict(self._sessions)
+        self._lock = manager.Lock()
+
+    def should_announce(self, session_id, stop_id, confidence):
+        """Record one ping and return True only the first time a stop becomes stable"""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            # A copy when shared, so it is written back below
+            state = self._sessions.get(session_id) or {
+                'candidate': None,
+                'streak': 0,
+                'announced': deque(maxlen=ANNOUNCED_HISTORY),
+            }
+            state['last_seen'] = now
+            announce = False
+
+            if confidence < self.confidence:
+                # Confidence must hold across consecutive pings
+                state['candidate'] = None
+                state['streak'] = 0
+            else:
+                if stop_id == state['candidate']:
+                    state['streak'] += 1
+                else:
+                    state['candidate'] = stop_id
+                    state['streak'] = 1
+
+                if state['streak'] >= self.min_pings and stop_id not in state['announced']:
+                    state['announced'].append(stop_id)
+                    announce = True
+
+            self._sessions[session_id] = state
+            return announce
+
+    def active_sessions(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _prune(self, now):
+        if now - self._last_prune < PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        expired = [session_id for session_id, state in list(self._sessions.items())
+                   if now - state['last_seen'] > self.ttl_seconds]
+        for session_id in expired:
+            del self._sessions[session_id]
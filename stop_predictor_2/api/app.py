@@ -1,47 +1,26 @@
 # app.py - FIXED VERSION
 from flask import Flask, request, jsonify, render_template
-import numpy as np
-import pandas as pd
-import pickle
-import json
-from datetime import datetime
 import math
 import os
+import time
+from announcements import AnnouncementTracker
+from eta import local_now
+from model_store import ModelStore
+from partition_registry import PartitionRegistry
+from response_encoding import ResponseOptionError, encode_response, parse_response_options, stop_table_response
 
 app = Flask(__name__)
 
-# Load model and encoders
+# Load model, encoders and stop database (versioned artifacts if published, else the fixed paths)
 print("Loading model and encoders...")
+model_store = ModelStore()
+print(f"✅ Loaded {len(model_store.active.stop_database)} stops from database (model version {model_store.active.version})")
 
-# Load TensorFlow model with lazy loading
-model = None
-try:
-    import tensorflow as tf
-    model = tf.keras.models.load_model('bus_predictor.h5')
-    print("✅ TensorFlow model loaded successfully")
-except Exception as e:
-    print(f"⚠️  Warning: Could not load TensorFlow model: {e}")
-    print("API will work with heuristic predictions instead")
+# One small model per route cluster, if they have been trained (else the single model above)
+partition_registry = PartitionRegistry.load(model_store.active.stop_database, model_store.active.eta_table)
 
-try:
-    with open('route_encoder.pkl', 'rb') as f:
-        route_encoder = pickle.load(f)
-    with open('stop_encoder.pkl', 'rb') as f:
-        stop_encoder = pickle.load(f)
-    with open('scaler.pkl', 'rb') as f:
-        scaler = pickle.load(f)
-    print("✅ Encoders and scalers loaded successfully")
-except Exception as e:
-    print(f"⚠️  Warning: Could not load encoders: {e}")
-    route_encoder = None
-    stop_encoder = None
-    scaler = None
-
-# Load stop database
-with open('../data/stop_database.json', 'r') as f:
-    stop_database = json.load(f)
-
-print(f"✅ Loaded {len(stop_database)} stops from database")
+# Remembers what each rider has already heard
+announcement_tracker = AnnouncementTracker()
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two GPS points in meters"""
@@ -60,7 +39,7 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     
     return R * c
 
-def find_nearest_stop(latitude, longitude):
+def find_nearest_stop(latitude, longitude, stop_database):
     """Find the nearest stop from the database"""
     nearest_stop_id = None
     min_distance = float('inf')
@@ -89,12 +68,21 @@ def find_nearest_stop(latitude, longitude):
         }
     return None
 
-def predict_from_coordinates_internal(latitude, longitude):
-    """Internal function that can be called directly with coordinates"""
+def predict_from_coordinates_internal(latitude, longitude, session_id=None, route_id=None):
+    """Internal function that can be called directly with coordinates.
+
+    With a session_id, audio is only included (and play_audio set) the first time
+    a stop is predicted confidently on consecutive pings for that session.
+    With route-partitioned models, route_id (or else the nearest stop) picks the partition.
+    """
     print(f"📍 Processing coordinates: {latitude}, {longitude}")
+
+    # Use one bundle for the whole request, even if a new version is swapped in meanwhile
+    bundle = model_store.active
+    stop_database = bundle.stop_database
     
     # Find nearest stop from database
-    nearest_stop = find_nearest_stop(latitude, longitude)
+    nearest_stop = find_nearest_stop(latitude, longitude, stop_database)
     
     if not nearest_stop:
         return {'error': 'No nearby stops found in database'}, 400
@@ -102,41 +90,30 @@ def predict_from_coordinates_internal(latitude, longitude):
     print(f"🎯 Nearest stop: {nearest_stop['english_name']} (ID: {nearest_stop['stop_id']})")
     
     # Prepare features for prediction
-    current_time = datetime.now()
+    current_time = local_now()
     
     # Use the nearest stop as previous stop context
     prev_stop_id = nearest_stop['stop_id']
     
-    features = pd.DataFrame([{
-        'latitude': latitude,
-        'longitude': longitude, 
-        'route_id': 0,
-        'speed': 8.0,
-        'acceleration': 0,
-        'distance_moved': 100,
-        'hour': current_time.hour,
-        'is_weekend': 1 if current_time.weekday() in [5, 6] else 0,
-        'is_peak_hours': 1 if current_time.hour in [7, 8, 9, 17, 18, 19] else 0,
-        'prev_stop': prev_stop_id,
-        'stop_sequence': 1,
-        'total_stops_in_trip': 20
-    }])
-    
-    # Encode and scale features
-    features['route_id'] = route_encoder.transform(features['route_id'])
-    features['prev_stop'] = stop_encoder.transform(features['prev_stop'].astype(str))
-    
-    numerical_cols = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed', 
-                     'acceleration', 'stop_sequence', 'total_stops_in_trip']
-    features[numerical_cols] = scaler.transform(features[numerical_cols])
-    
     # Predict next stop
-    prediction = model.predict(features)
-    predicted_index = np.argmax(prediction, axis=1)[0]
-    confidence = float(np.max(prediction))
-
-    # Get predicted stop info
-    predicted_stop_id = int(stop_encoder.classes_[predicted_index])
+    partition = partition_registry.resolve(route_id, prev_stop_id) if partition_registry else None
+    predictor = None
+    if partition:
+        cluster, partition_route_id = partition
+        try:
+            predictor = partition_registry.get(cluster)
+        except Exception as e:
+            print(f"⚠️  Warning: Partition {cluster} unavailable, using the single model: {e}")
+    if predictor is not None:
+        route_id = partition_route_id
+        predicted_stop_id, confidence = predictor.predict_next_stop(latitude, longitude, prev_stop_id,
+                                                                    current_time, route_id=route_id)
+    else:
+        predictor = bundle
+        start = time.perf_counter()
+        predicted_stop_id, confidence = bundle.predict_next_stop(latitude, longitude, prev_stop_id, current_time)
+        active_ms = (time.perf_counter() - start) * 1000
+        model_store.maybe_shadow(latitude, longitude, prev_stop_id, current_time, predicted_stop_id, active_ms)
     
     # Find predicted stop in database
     predicted_stop_info = None
@@ -148,9 +125,16 @@ def predict_from_coordinates_internal(latitude, longitude):
     if predicted_stop_info:
         english_name = predicted_stop_info['english']
         hindi_name = predicted_stop_info['hindi']
+        remaining_meters = calculate_distance(latitude, longitude,
+                                              predicted_stop_info['latitude'],
+                                              predicted_stop_info['longitude'])
     else:
         english_name = f"Stop {predicted_stop_id}"
         hindi_name = f"स्टॉप {predicted_stop_id}"
+        remaining_meters = nearest_stop['distance_meters']
+    
+    eta_seconds = bundle.eta_table.estimate(prev_stop_id, predicted_stop_id,
+                                            remaining_meters, current_time.hour, route_id)
     
     response = {
         'current_location': {
@@ -161,14 +145,25 @@ def predict_from_coordinates_internal(latitude, longitude):
             'stop_id': predicted_stop_id,
             'stop_name_english': english_name,
             'stop_name_hindi': hindi_name,
-            'confidence': confidence
-        },
-        'audio': {
+            'confidence': confidence,
+            'eta_seconds': eta_seconds,
+            'distance_meters': remaining_meters if predicted_stop_info else None,
+            'model_version': predictor.version
+        }
+    }
+
+    if session_id:
+        play_audio = announcement_tracker.should_announce(session_id, predicted_stop_id, confidence)
+    else:
+        play_audio = confidence > 0.6
+
+    # Stateless clients always get the audio text, sessions only when there is something new
+    if play_audio or not session_id:
+        response['audio'] = {
             'english': f"Next stop is {english_name}",
             'hindi': f"Agalaaaa staation  haaaa {hindi_name}"
-        },
-        'play_audio': confidence > 0.6
-    }
+        }
+    response['play_audio'] = play_audio
     
     print(f"✅ Prediction: {english_name} (Confidence: {confidence:.2%})")
     return response, 200
@@ -218,6 +213,8 @@ def index():
 @app.route('/predict_from_coordinates', methods=['OPTIONS'])
 @app.route('/predict_from_demo', methods=['OPTIONS'])
 @app.route('/health', methods=['OPTIONS'])
+@app.route('/stop_table', methods=['OPTIONS'])
+@app.route('/model_status', methods=['OPTIONS'])
 def options_handler():
     return jsonify({'status': 'ok'}), 200
 
@@ -229,10 +226,15 @@ def predict_from_coordinates():
         # Get coordinates from request or use demo location
         latitude = float(data.get('latitude', 28.668132))
         longitude = float(data.get('longitude', 77.228502))
+        session_id = data.get('session_id')
+        route_id = data.get('route_id')
+        options = parse_response_options(request, data)
         
-        response, status_code = predict_from_coordinates_internal(latitude, longitude)
-        return jsonify(response), status_code
+        response, status_code = predict_from_coordinates_internal(latitude, longitude, session_id, route_id)
+        return encode_response(response, status_code, options)
         
+    except ResponseOptionError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         print(f"❌ Prediction error: {e}")
         return jsonify({'error': str(e)}), 400
@@ -242,6 +244,7 @@ def predict_from_demo():
     try:
         data = request.json or {}
         location_key = data.get('location', 'kashmere_gate')
+        options = parse_response_options(request, data)
         
         # Get demo location
         location_data = demo_locations.get(location_key, demo_locations['kashmere_gate'])
@@ -262,22 +265,70 @@ def predict_from_demo():
                 'location_key': location_key
             }
         
-        return jsonify(response), status_code
+        return encode_response(response, status_code, options)
         
+    except ResponseOptionError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         print(f"❌ Demo error: {e}")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/stop_table', methods=['GET'])
+def stop_table():
+    """All stops, for clients using mode=ids to resolve names locally"""
+    return stop_table_response(request, model_store.active.stop_database)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'API is running!', 
-        'stops_in_database': len(stop_database),
+        'stops_in_database': len(model_store.active.stop_database),
         'demo_locations': len(demo_locations),
-        'model_loaded': model is not None
+        'model_loaded': model_store.active.model is not None,
+        'model_version': model_store.active.version,
+        'announcement_sessions': announcement_tracker.active_sessions()
     })
 
+@app.route('/model_status', methods=['GET'])
+def model_status():
+    """Active model version and shadow comparison against the candidate"""
+    status = model_store.status()
+    status['partitions'] = partition_registry.status() if partition_registry else None
+    return jsonify(status)
+
+def share_state(manager):
+    """Called by serve.py before forking, so every worker sees the same riders and shadow stats"""
+    announcement_tracker.share(manager)
+    model_store.shadow_stats.share(manager)
+    if partition_registry:
+        partition_registry.share(manager)
+
+# Under serve.py only this worker loads the shadow candidate (stats are shared, see share_state)
+SHADOW_WORKER_SLOT = 0
+
+def check_for_update():
+    """Called by serve.py in the parent: a new active version means a rolling restart,
+    so workers get it from the fork instead of each loading their own copy"""
+    return model_store.check_for_update(load_candidate=False, warm_up=False)
+
+def on_worker_start(slot=None):
+    """Called by serve.py in every forked worker (threads and TensorFlow don't survive fork)"""
+    try:
+        model_store.active.load_model()
+    except Exception as e:
+        print(f"⚠️  Warning: Could not load TensorFlow model: {e}")
+    if model_store.active.model is not None:
+        try:
+            model_store.active.warm_up()
+        except Exception as e:
+            print(f"⚠️  Warning: Warm-up prediction failed: {e}")
+    if slot is None:
+        model_store.start_watcher()
+    elif slot == SHADOW_WORKER_SLOT:
+        model_store.start_watcher(swap_active=False)
+
 if __name__ == '__main__':
+    on_worker_start()
     print("🚌 Enhanced Bus Stop Prediction API Started!")
     print("📍 Now using actual stop database with 500+ stops")
     print("🌐 http://localhost:5000")
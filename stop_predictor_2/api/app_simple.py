@@ -3,6 +3,8 @@ from flask import Flask, request, jsonify
 import json
 import math
 from datetime import datetime
+from eta import EtaTable, local_now
+from response_encoding import ResponseOptionError, encode_response, parse_response_options, stop_table_response
 
 app = Flask(__name__)
 
@@ -13,6 +15,7 @@ db_path = os.path.join(os.path.dirname(__file__), '../data/stop_database.json')
 with open(db_path, 'r') as f:
     stop_database = json.load(f)
 print(f"✅ Loaded {len(stop_database)} stops from database")
+eta_table = EtaTable.load(os.path.join(os.path.dirname(__file__), '../data/eta_table.json'))
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two GPS points in meters"""
@@ -88,6 +91,7 @@ def predict_from_coordinates():
         # Get coordinates from request
         latitude = float(data.get('latitude', 28.668132))
         longitude = float(data.get('longitude', 77.228502))
+        options = parse_response_options(request, data)
         
         print(f"📍 Processing coordinates: {latitude}, {longitude}")
         
@@ -105,6 +109,10 @@ def predict_from_coordinates():
         import random
         predicted_stop_id = random.choice(list(stop_database.keys()))
         predicted_stop = stop_database[predicted_stop_id]
+        remaining_meters = calculate_distance(latitude, longitude,
+                                              predicted_stop['latitude'], predicted_stop['longitude'])
+        eta_seconds = eta_table.estimate(nearest_stop['stop_id'], int(predicted_stop_id),
+                                         remaining_meters, local_now().hour)
         
         response = {
             'current_location': {
@@ -116,7 +124,8 @@ def predict_from_coordinates():
                 'stop_name_english': predicted_stop.get('english', f'Stop {predicted_stop_id}'),
                 'stop_name_hindi': predicted_stop.get('hindi', ''),
                 'confidence': 0.75,
-                'eta_seconds': 300
+                'eta_seconds': eta_seconds,
+                'distance_meters': remaining_meters
             },
             'audio': {
                 'english': f"Next stop is {predicted_stop.get('english', f'Stop {predicted_stop_id}')}",
@@ -124,14 +133,21 @@ def predict_from_coordinates():
             }
         }
         
-        return jsonify(response), 200
+        return encode_response(response, 200, options)
         
+    except ResponseOptionError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 400
 
+@app.route('/stop_table', methods=['GET'])
+def stop_table():
+    """All stops, for clients using mode=ids to resolve names locally"""
+    return stop_table_response(request, stop_database)
+
 @app.route('/stops', methods=['GET'])
 def get_stops():
     """Get all stops"""
@@ -0,0 +1,152 @@
+#Package everything the mobile web app needs to predict without the API: stop table, stop-to-stop transition table and int8-quantized model weights.
+#Run from the api folder (same working directory as app.py). Output: ../mobile_app/static/offline_bundle.json
+#Built from the version the API serves (artifacts/manifest.json's active version, else the fixed legacy paths),
+#so rebuild it after promoting a new version.
+
+import base64
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from model_store import ARTIFACTS_DIR, MANIFEST_NAME, ModelBundle, read_json
+
+OUTPUT_PATH = '../mobile_app/static/offline_bundle.json'
+PROCESSED_DATA_PATH = '../data/processed_bus_data.csv'
+
+# Keep only the most likely next stops per stop, the client never needs the long tail
+TRANSITIONS_PER_STOP = 3
+
+# Must match the column order used by app.py when it builds the feature row
+FEATURE_COLUMNS = [
+    'latitude', 'longitude', 'route_id', 'speed', 'acceleration',
+    'distance_moved', 'hour', 'is_weekend', 'is_peak_hours',
+    'prev_stop', 'stop_sequence', 'total_stops_in_trip'
+]
+NUMERICAL_COLS = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed',
+                  'acceleration', 'stop_sequence', 'total_stops_in_trip']
+
+
+def build_stop_table(stop_database):
+    """Compact stop table: {stop_id: [english, hindi, lat, lon]}"""
+    return {
+        str(stop_id): [
+            info['english'],
+            info.get('hindi', ''),
+            round(info['latitude'], 6),
+            round(info['longitude'], 6)
+        ]
+        for stop_id, info in stop_database.items()
+    }
+
+
+def build_transition_table(path):
+    """Most frequent next stops for every previous stop, as [[next_stop, probability], ...]"""
+    if not os.path.exists(path):
+        print(f"⚠️  Warning: {path} not found, bundle will have no transition table")
+        return {}
+
+    df = pd.read_csv(path, usecols=['prev_stop', 'next_stop_id'])
+    df = df[(df['prev_stop'] != 0) & (df['prev_stop'] != df['next_stop_id'])]
+    df['prev_stop'] = df['prev_stop'].astype(int)
+
+    counts = df.groupby(['prev_stop', 'next_stop_id']).size().reset_index(name='count')
+    counts['probability'] = counts['count'] / counts.groupby('prev_stop')['count'].transform('sum')
+    counts = counts.sort_values(['prev_stop', 'count'], ascending=[True, False])
+
+    transitions = {}
+    for prev_stop, group in counts.groupby('prev_stop'):
+        top = group.head(TRANSITIONS_PER_STOP)
+        transitions[str(prev_stop)] = [
+            [int(row.next_stop_id), round(float(row.probability), 3)]
+            for row in top.itertuples()
+        ]
+    return transitions
+
+
+def quantize_dense_layers(model):
+    """Symmetric per-layer int8 quantization of every Dense layer (Dropout is a no-op at inference)"""
+    layers = []
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if len(weights) != 2:
+            continue
+        kernel, bias = weights
+        max_abs = float(np.max(np.abs(kernel)))
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.round(kernel / scale), -127, 127).astype(np.int8)
+        layers.append({
+            'inputs': int(kernel.shape[0]),
+            'units': int(kernel.shape[1]),
+            'activation': layer.get_config().get('activation', 'linear'),
+            'scale': scale,
+            # Row-major [inputs x units]
+            'kernel': base64.b64encode(quantized.tobytes()).decode('ascii'),
+            'bias': base64.b64encode(bias.astype('<f4').tobytes()).decode('ascii')
+        })
+    return layers
+
+
+def load_active_bundle():
+    """The ModelBundle the API is serving"""
+    manifest_path = os.path.join(ARTIFACTS_DIR, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        return ModelBundle.load_version(ARTIFACTS_DIR, read_json(manifest_path)['active'])
+    return ModelBundle.load_legacy()
+
+
+def build_model_section(model_bundle):
+    """Quantized weights plus the encoder/scaler parameters needed to rebuild the feature row"""
+    try:
+        model = model_bundle.load_model()
+        route_encoder = model_bundle.route_encoder
+        stop_encoder = model_bundle.stop_encoder
+        scaler = model_bundle.scaler
+        if model is None or route_encoder is None:
+            raise ValueError("model or encoders missing")
+    except Exception as e:
+        print(f"⚠️  Warning: Could not load model/encoders, bundle will use transitions only: {e}")
+        return None
+
+    # app.py always sends route 0, so only its encoded value is needed on the client
+    try:
+        default_route_index = int(route_encoder.transform([0])[0])
+    except ValueError:
+        default_route_index = 0
+
+    return {
+        'feature_columns': FEATURE_COLUMNS,
+        'default_route_index': default_route_index,
+        'stop_classes': [int(c) for c in stop_encoder.classes_],
+        'scaler': {
+            col: [float(mean), float(scale)]
+            for col, mean, scale in zip(NUMERICAL_COLS, scaler.mean_, scaler.scale_)
+        },
+        'layers': quantize_dense_layers(model)
+    }
+
+
+if __name__ == '__main__':
+    print("📦 Building offline bundle...")
+
+    model_bundle = load_active_bundle()
+    stop_database = model_bundle.stop_database
+    print(f"✅ Loaded {len(stop_database)} stops from database (model version {model_bundle.version})")
+
+    bundle = {
+        'version': 1,
+        'model_version': model_bundle.version,
+        'stops': build_stop_table(stop_database),
+        'transitions': build_transition_table(PROCESSED_DATA_PATH),
+        'model': build_model_section(model_bundle)
+    }
+    print(f"✅ Transition table covers {len(bundle['transitions'])} stops")
+    if bundle['model']:
+        print(f"✅ Quantized {len(bundle['model']['layers'])} dense layers to int8")
+
+    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(bundle, f, ensure_ascii=False, separators=(',', ':'))
+
+    size_kb = os.path.getsize(OUTPUT_PATH) / 1024
+    print(f"💾 Offline bundle saved as '{OUTPUT_PATH}' ({size_kb:.1f} KB)")
@@ -0,0 +1,73 @@
+# O(1) arrival estimates from the travel-time table built by model_making/f_eta_table.py.
+#
+# Lookup order, most to least specific:
+#   1. median time of this route's segment (nearest stop -> predicted stop) in this hour bucket
+#   2. the same segment on any route
+#   3. median speed of the route, then of all routes, in this hour bucket
+#   4. DEFAULT_SPEED_MPS
+# Segment times are scaled by how much of the segment is left to drive.
+
+import json
+import os
+from bisect import bisect_right
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Same assumption app.py feeds the model when the real speed is unknown
+DEFAULT_SPEED_MPS = 8.0
+DEFAULT_HOUR_BUCKET_STARTS = [0, 6, 10, 16, 20]
+# Timestamps in the data are UTC epoch seconds; hour buckets and the model's hour feature
+# are in the city's local time, when training (model_making) and when serving
+TIMEZONE = 'Asia/Kolkata'
+
+
+def local_now():
+    """Current time in TIMEZONE, whatever the server's own timezone is"""
+    return datetime.now(ZoneInfo(TIMEZONE))
+
+
+class EtaTable:
+    def __init__(self, data=None):
+        data = data or {}
+        self.hour_bucket_starts = data.get('hour_bucket_starts', DEFAULT_HOUR_BUCKET_STARTS)
+        self.route_segments = data.get('route_segments', {})
+        self.segments = data.get('segments', {})
+        self.route_speeds = data.get('route_speeds', {})
+        self.speeds = data.get('speeds', {})
+
+    @classmethod
+    def load(cls, path):
+        """Load the table, or an empty one (default speed only) if it hasn't been built"""
+        if not os.path.exists(path):
+            print(f"⚠️  Warning: {path} not found, ETAs will use a default speed")
+            return cls()
+        with open(path, 'r') as f:
+            table = cls(json.load(f))
+        print(f"✅ Loaded ETA table with {len(table.segments)} segments")
+        return table
+
+    def hour_bucket(self, hour):
+        return bisect_right(self.hour_bucket_starts, hour) - 1
+
+    def estimate(self, from_stop, to_stop, remaining_meters, hour, route_id=None):
+        """Seconds until arrival at to_stop, with remaining_meters left to drive"""
+        bucket = self.hour_bucket(hour)
+
+        if from_stop != to_stop:
+            segment = None
+            if route_id is not None:
+                segment = self.route_segments.get(f"{route_id}|{from_stop}|{to_stop}|{bucket}")
+            if segment is None:
+                segment = self.segments.get(f"{from_stop}|{to_stop}|{bucket}")
+            if segment is not None:
+                seconds, distance, _ = segment
+                if distance:
+                    return int(round(seconds * remaining_meters / distance))
+                return int(round(seconds))
+
+        speed = None
+        if route_id is not None:
+            speed = self.route_speeds.get(f"{route_id}|{bucket}")
+        if speed is None:
+            speed = self.speeds.get(str(bucket), DEFAULT_SPEED_MPS)
+        return int(round(remaining_meters / max(speed, 0.5)))
@@ -0,0 +1,403 @@
+# Versioned model artifacts that can be swapped without restarting the API.
+#
+# Layout (written by model_making/publish_artifacts.py):
+#   artifacts/manifest.json          {"active": "<version>", "candidate": "<version>" | null, "shadow_fraction": 0.1}
+#   artifacts/<version>/manifest.json {"version", "created_at", "files": {name: sha256}, ...}
+#   artifacts/<version>/bus_predictor.h5, route_encoder.pkl, stop_encoder.pkl, scaler.pkl, stop_database.json
+#   artifacts/<version>/eta_table.json (optional)
+#
+# A background thread watches artifacts/manifest.json. New versions are loaded,
+# checked and warmed up off the request path, then swapped in with a single
+# reference assignment, so a request always sees one complete bundle.
+# Only the active version is loaded at import; the shadow candidate is loaded and
+# warmed up by the watcher, so nothing is predicted before serve.py forks.
+# Under serve.py the parent watches for new active versions and rolls the workers
+# (app.check_for_update), and only one worker loads the candidate (app.on_worker_start).
+# A version that fails to load is retried with exponential backoff.
+# Without an artifacts directory the old fixed paths are used (version "legacy").
+#
+# The Keras model itself is only built on first use (or by load_model()), never at import,
+# so serve.py can fork workers before TensorFlow starts its runtime.
+
+import hashlib
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from eta import EtaTable, local_now
+
+ARTIFACTS_DIR = 'artifacts'
+MANIFEST_NAME = 'manifest.json'
+POLL_INTERVAL_SECONDS = 10
+
+MODEL_FILE = 'bus_predictor.h5'
+ROUTE_ENCODER_FILE = 'route_encoder.pkl'
+STOP_ENCODER_FILE = 'stop_encoder.pkl'
+SCALER_FILE = 'scaler.pkl'
+STOP_DATABASE_FILE = 'stop_database.json'
+LEGACY_STOP_DATABASE_PATH = '../data/stop_database.json'
+ETA_TABLE_FILE = 'eta_table.json'
+LEGACY_ETA_TABLE_PATH = '../data/eta_table.json'
+
+NUMERICAL_COLS = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed',
+                  'acceleration', 'stop_sequence', 'total_stops_in_trip']
+
+# Latency/agreement samples kept for /model_status
+SHADOW_SAMPLES = 1000
+# Longest wait before retrying a version that failed to load
+MAX_RETRY_SECONDS = 60 * 60
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ModelBundle:
+    """One consistent set of model, encoders, scaler, stop database and ETA table"""
+
+    def __init__(self, version, model, route_encoder, stop_encoder, scaler, stop_database, eta_table=None,
+                 model_path=None):
+        self.version = version
+        self.model = model
+        self.model_path = model_path
+        self._model_lock = threading.Lock()
+        self.route_encoder = route_encoder
+        self.stop_encoder = stop_encoder
+        self.scaler = scaler
+        self.stop_database = stop_database
+        self.eta_table = eta_table or EtaTable()
+        self.loaded_at = datetime.now().isoformat()
+
+    @classmethod
+    def load_legacy(cls):
+        """The original fixed paths, tolerating missing encoders (the model is loaded later)"""
+        try:
+            with open(ROUTE_ENCODER_FILE, 'rb') as f:
+                route_encoder = pickle.load(f)
+            with open(STOP_ENCODER_FILE, 'rb') as f:
+                stop_encoder = pickle.load(f)
+            with open(SCALER_FILE, 'rb') as f:
+                scaler = pickle.load(f)
+            print("✅ Encoders and scalers loaded successfully")
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load encoders: {e}")
+            route_encoder = None
+            stop_encoder = None
+            scaler = None
+
+        stop_database = read_json(LEGACY_STOP_DATABASE_PATH)
+        eta_table = EtaTable.load(LEGACY_ETA_TABLE_PATH)
+        return cls('legacy', None, route_encoder, stop_encoder, scaler, stop_database, eta_table,
+                   model_path=MODEL_FILE)
+
+    @classmethod
+    def load_dir(cls, directory, version, stop_database, eta_table=None):
+        """Encoders and scaler from one directory, sharing an already loaded stop database"""
+        with open(os.path.join(directory, ROUTE_ENCODER_FILE), 'rb') as f:
+            route_encoder = pickle.load(f)
+        with open(os.path.join(directory, STOP_ENCODER_FILE), 'rb') as f:
+            stop_encoder = pickle.load(f)
+        with open(os.path.join(directory, SCALER_FILE), 'rb') as f:
+            scaler = pickle.load(f)
+        return cls(version, None, route_encoder, stop_encoder, scaler, stop_database, eta_table,
+                   model_path=os.path.join(directory, MODEL_FILE))
+
+    @classmethod
+    def load_version(cls, artifacts_dir, version):
+        """Load a published version, refusing files that don't match its manifest"""
+        version_dir = os.path.join(artifacts_dir, version)
+        manifest = read_json(os.path.join(version_dir, MANIFEST_NAME))
+        for name, expected in manifest.get('files', {}).items():
+            if file_sha256(os.path.join(version_dir, name)) != expected:
+                raise ValueError(f"Checksum mismatch for {name} in version {version}")
+
+        stop_database_path = os.path.join(version_dir, STOP_DATABASE_FILE)
+        if not os.path.exists(stop_database_path):
+            stop_database_path = LEGACY_STOP_DATABASE_PATH
+        stop_database = read_json(stop_database_path)
+
+        eta_table_path = os.path.join(version_dir, ETA_TABLE_FILE)
+        if not os.path.exists(eta_table_path):
+            eta_table_path = LEGACY_ETA_TABLE_PATH
+        eta_table = EtaTable.load(eta_table_path)
+
+        return cls.load_dir(version_dir, version, stop_database, eta_table)
+
+    def load_model(self):
+        """Build the Keras model in this process, once"""
+        with self._model_lock:
+            if self.model is None and self.model_path is not None:
+                import tensorflow as tf
+                self.model = tf.keras.models.load_model(self.model_path)
+                print(f"✅ TensorFlow model loaded (version {self.version}, pid {os.getpid()})")
+        return self.model
+
+    def predict_next_stop(self, latitude, longitude, prev_stop_id, current_time, route_id=0):
+        """Return (predicted_stop_id, confidence)"""
+        features = pd.DataFrame([{
+            'latitude': latitude,
+            'longitude': longitude,
+            'route_id': route_id,
+            'speed': 8.0,
+            'acceleration': 0,
+            'distance_moved': 100,
+            'hour': current_time.hour,
+            'is_weekend': 1 if current_time.weekday() in [5, 6] else 0,
+            'is_peak_hours': 1 if current_time.hour in [7, 8, 9, 17, 18, 19] else 0,
+            'prev_stop': prev_stop_id,
+            'stop_sequence': 1,
+            'total_stops_in_trip': 20
+        }])
+
+        # Encode and scale features
+        features['route_id'] = self.route_encoder.transform(features['route_id'])
+        features['prev_stop'] = self.stop_encoder.transform(features['prev_stop'].astype(str))
+        features[NUMERICAL_COLS] = self.scaler.transform(features[NUMERICAL_COLS])
+
+        prediction = self.load_model().predict(features)
+        predicted_index = np.argmax(prediction, axis=1)[0]
+        confidence = float(np.max(prediction))
+
+        return int(self.stop_encoder.classes_[predicted_index]), confidence
+
+    def warm_up(self):
+        """Run one prediction so the first real request doesn't pay for graph tracing"""
+        stop_id, stop_info = next(iter(self.stop_database.items()))
+        self.predict_next_stop(stop_info['latitude'], stop_info['longitude'],
+                               int(stop_id), local_now())
+
+
+class ShadowStats:
+    """Latency and agreement of the candidate version against the active one"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+        self.reset(None)
+
+    def share(self, manager):
+        """Keep the stats in a multiprocessing.Manager, so every pre-forked worker adds to the same numbers"""
+        self._state = manager.dict(self._state)
+        self._lock = manager.Lock()
+
+    @property
+    def candidate_version(self):
+        return self._state['candidate_version']
+
+    def reset(self, candidate_version):
+        with self._lock:
+            self._state.update({
+                'candidate_version': candidate_version,
+                'shadow_fraction': self._state.get('shadow_fraction', 0.0),
+                'compared': 0,
+                'agreed': 0,
+                'errors': 0,
+                'active_latency_ms': deque(maxlen=SHADOW_SAMPLES),
+                'candidate_latency_ms': deque(maxlen=SHADOW_SAMPLES)
+            })
+
+    @property
+    def shadow_fraction(self):
+        return self._state['shadow_fraction']
+
+    def set_shadow_fraction(self, fraction):
+        self._state['shadow_fraction'] = fraction
+
+    def record(self, agreed, active_ms, candidate_ms):
+        with self._lock:
+            # A copy when shared, written back in one update
+            state = self._state.copy()
+            state['compared'] += 1
+            state['agreed'] += int(agreed)
+            state['active_latency_ms'].append(active_ms)
+            state['candidate_latency_ms'].append(candidate_ms)
+            self._state.update(state)
+
+    def record_error(self):
+        with self._lock:
+            self._state['errors'] = self._state['errors'] + 1
+
+    def summary(self):
+        def percentiles(samples):
+            if not samples:
+                return None
+            values = np.array(samples)
+            return {'p50': round(float(np.percentile(values, 50)), 2),
+                    'p95': round(float(np.percentile(values, 95)), 2)}
+
+        with self._lock:
+            state = self._state.copy()
+        compared = state['compared']
+        return {
+            'candidate_version': state['candidate_version'],
+            'compared': compared,
+            'errors': state['errors'],
+            'agreement': round(state['agreed'] / compared, 4) if compared else None,
+            'active_latency_ms': percentiles(state['active_latency_ms']),
+            'candidate_latency_ms': percentiles(state['candidate_latency_ms'])
+        }
+
+
+class ModelStore:
+    """Holds the active bundle, an optional shadow candidate, and the watcher thread"""
+
+    def __init__(self, artifacts_dir=ARTIFACTS_DIR, poll_interval=POLL_INTERVAL_SECONDS):
+        self.artifacts_dir = artifacts_dir
+        self.poll_interval = poll_interval
+        self.manifest_path = os.path.join(artifacts_dir, MANIFEST_NAME)
+        self.candidate = None
+        self.shadow_fraction = 0.0
+        self.shadow_stats = ShadowStats()
+        self.last_error = None
+        self._manifest_mtime = None
+        self._failed = {}  # version -> (failures, retry_at)
+        self._watcher = None
+        # One thread is enough: shadow scoring is sampled and must never slow requests
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1)
+
+        if os.path.exists(self.manifest_path):
+            # _manifest_mtime stays unset, so the watcher's first check picks up the candidate
+            manifest = read_json(self.manifest_path)
+            print(f"Loading model version {manifest['active']}...")
+            self.active = ModelBundle.load_version(artifacts_dir, manifest['active'])
+        else:
+            self.active = ModelBundle.load_legacy()
+
+    def start_watcher(self, swap_active=True):
+        """Start polling the manifest. Call once per process (after fork when pre-forking).
+
+        With swap_active=False only the shadow candidate is followed, new active
+        versions are left to serve.py's rolling restart.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        # A forked worker inherits the parent's mtime, but not its candidate
+        self._manifest_mtime = None
+        self._watcher = threading.Thread(target=self._watch, args=(swap_active,), daemon=True)
+        self._watcher.start()
+
+    def _watch(self, swap_active):
+        while True:
+            try:
+                self.check_for_update(swap_active=swap_active)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️  Warning: Could not load new model version: {e}")
+            time.sleep(self.poll_interval)
+
+    def check_for_update(self, swap_active=True, load_candidate=True, warm_up=True):
+        """Follow the manifest, True if the active version changed"""
+        if not os.path.exists(self.manifest_path):
+            return False
+        mtime = os.path.getmtime(self.manifest_path)
+        if mtime == self._manifest_mtime:
+            return False
+
+        manifest = read_json(self.manifest_path)
+        loaded = True
+        swapped = False
+        if swap_active and manifest['active'] != self.active.version:
+            if self.candidate is not None and self.candidate.version == manifest['active']:
+                bundle = self.candidate  # already loaded and warm
+            else:
+                print(f"🔄 Loading model version {manifest['active']} in the background...")
+                bundle = self._load_version(manifest['active'], warm_up)
+            if bundle is None:
+                loaded = False
+            else:
+                self.active = bundle
+                swapped = True
+                print(f"✅ Swapped to model version {bundle.version}")
+        if load_candidate:
+            loaded = self._apply_candidate(manifest) and loaded
+
+        # Only remember the manifest once everything in it loaded, so a failed
+        # load (half-copied file, checksum race) is retried after its backoff
+        if loaded:
+            self._manifest_mtime = mtime
+            self.last_error = None
+        return swapped
+
+    def _load_version(self, version, warm_up=True):
+        """The loaded bundle, or None if it failed now or recently (retried with backoff)"""
+        failures, retry_at = self._failed.get(version, (0, 0))
+        if time.time() < retry_at:
+            return None
+        try:
+            bundle = ModelBundle.load_version(self.artifacts_dir, version)
+            if warm_up:
+                bundle.warm_up()
+        except Exception as e:
+            failures += 1
+            delay = min(self.poll_interval * 2 ** failures, MAX_RETRY_SECONDS)
+            self._failed[version] = (failures, time.time() + delay)
+            self.last_error = f"Version {version}: {e}"
+            print(f"⚠️  Warning: Could not load model version {version} (retrying in {delay:.0f}s): {e}")
+            return None
+        self._failed.pop(version, None)
+        return bundle
+
+    def _apply_candidate(self, manifest):
+        """Load the manifest's candidate if it changed, False if it could not be loaded"""
+        candidate_version = manifest.get('candidate')
+        if candidate_version == self.active.version:
+            candidate_version = None
+
+        if candidate_version is None:
+            self.candidate = None
+        elif self.candidate is None or self.candidate.version != candidate_version:
+            # A broken candidate must never take the active version down with it
+            self.candidate = self._load_version(candidate_version)
+            if self.candidate is None:
+                return False
+            print(f"👥 Shadow-scoring candidate version {candidate_version}")
+
+        if self.shadow_stats.candidate_version != candidate_version:
+            self.shadow_stats.reset(candidate_version)
+        self.shadow_fraction = float(manifest.get('shadow_fraction', 0.0))
+        self.shadow_stats.set_shadow_fraction(self.shadow_fraction)
+        return True
+
+    def maybe_shadow(self, latitude, longitude, prev_stop_id, current_time, active_stop_id, active_ms):
+        """Score a sample of traffic against the candidate, in the background"""
+        candidate = self.candidate
+        if candidate is None or random.random() >= self.shadow_fraction:
+            return
+
+        def score():
+            try:
+                start = time.perf_counter()
+                stop_id, _ = candidate.predict_next_stop(latitude, longitude, prev_stop_id, current_time)
+                candidate_ms = (time.perf_counter() - start) * 1000
+                self.shadow_stats.record(stop_id == active_stop_id, active_ms, candidate_ms)
+            except Exception:
+                self.shadow_stats.record_error()
+
+        self._shadow_executor.submit(score)
+
+    def status(self):
+        return {
+            'active_version': self.active.version,
+            'active_loaded_at': self.active.loaded_at,
+            'shadow_fraction': self.shadow_stats.shadow_fraction,
+            'shadow': self.shadow_stats.summary(),
+            'last_error': self.last_error
+        }
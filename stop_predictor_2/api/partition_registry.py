@@ -0,0 +1,179 @@
+# Route-partitioned models trained by model_making/g_partitioned_training.py.
+#
+# Instead of one softmax over every stop in the city, each route cluster has its own
+# small model. Partitions are loaded on first use and kept in an LRU bounded by a
+# memory budget, so only the clusters that currently have riders stay in memory.
+#
+# The budget applies per process: under serve.py each of the N workers keeps its own
+# LRU, so the partitions can take up to N x the budget in total. Set it in megabytes with
+# PARTITION_MEMORY_BUDGET_MB (default 512). A partition that fails to load is not retried
+# for LOAD_RETRY_SECONDS; app.py answers with the single model meanwhile.
+#
+# Layout:
+#   partitions/index.json     {"routes": {route_id: cluster}, "stops": {stop_id: [cluster, route_id]},
+#                              "clusters": {cluster: {"stop_ids": [...], ...}}}
+#   partitions/<cluster>/     bus_predictor.h5, route_encoder.pkl, stop_encoder.pkl, scaler.pkl
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from model_store import ModelBundle
+
+PARTITIONS_DIR = 'partitions'
+INDEX_NAME = 'index.json'
+# Rough in-memory size of one process's loaded partitions, estimated from their files on disk
+MEMORY_BUDGET_ENV = 'PARTITION_MEMORY_BUDGET_MB'
+DEFAULT_MEMORY_BUDGET_MB = 512
+LOAD_RETRY_SECONDS = 60
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class PartitionRegistry:
+    """Maps a request to its route cluster and lazily loads that cluster's model"""
+
+    def __init__(self, partitions_dir, index, stop_database, eta_table=None,
+                 memory_budget_bytes=DEFAULT_MEMORY_BUDGET_MB * 1024**2):
+        self.partitions_dir = partitions_dir
+        self.route_to_cluster = {int(route): str(cluster) for route, cluster in index['routes'].items()}
+        self.stop_to_partition = {int(stop): (str(cluster), route)
+                                  for stop, (cluster, route) in index['stops'].items()}
+        # Stops each partition's stop encoder knows, a model can't be asked about any other stop
+        self.cluster_stops = {str(cluster): set(info['stop_ids'])
+                              for cluster, info in index['clusters'].items()}
+        self.stop_database = stop_database
+        self.eta_table = eta_table
+        self.memory_budget_bytes = memory_budget_bytes
+
+        self._loaded = OrderedDict()  # cluster -> (bundle, size_bytes), least recently used first
+        self._loaded_bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._failed = {}  # cluster -> time.time() after which loading is retried
+        self.loads = 0
+        self.evictions = 0
+        self._worker_status = None  # pid -> status, shared between pre-forked workers
+
+    @classmethod
+    def load(cls, stop_database, eta_table=None, partitions_dir=PARTITIONS_DIR, memory_budget_mb=None):
+        """Registry for the partitions directory, or None if no partitioned models were trained"""
+        index_path = os.path.join(partitions_dir, INDEX_NAME)
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.environ.get(MEMORY_BUDGET_ENV, DEFAULT_MEMORY_BUDGET_MB))
+        print(f"✅ Found {len(index['clusters'])} route-partitioned models "
+              f"(loaded on demand, {memory_budget_mb:g} MB per worker)")
+        return cls(partitions_dir, index, stop_database, eta_table, int(memory_budget_mb * 1024**2))
+
+    def share(self, manager):
+        """Publish each worker's loaded partitions to a multiprocessing.Manager for status()"""
+        self._worker_status = manager.dict()
+
+    def resolve(self, route_id, nearest_stop_id):
+        """(cluster, route_id) for this request, or None if no partition covers it
+
+        The client's route_id wins only if its partition knows the nearest stop,
+        otherwise the partition that sees that stop most often is used.
+        """
+        nearest_stop_id = int(nearest_stop_id)
+        try:
+            route_id = int(route_id)
+        except (TypeError, ValueError):
+            route_id = None
+
+        cluster = self.route_to_cluster.get(route_id)
+        if cluster is not None and nearest_stop_id in self.cluster_stops.get(cluster, ()):
+            return cluster, route_id
+        return self.stop_to_partition.get(nearest_stop_id)
+
+    def get(self, cluster):
+        """The cluster's ModelBundle, loading it (and evicting others) if needed"""
+        with self._lock:
+            if cluster in self._loaded:
+                self._loaded.move_to_end(cluster)
+                return self._loaded[cluster][0]
+            load_lock = self._load_locks.setdefault(cluster, threading.Lock())
+
+        # Load outside the registry lock so other clusters keep serving;
+        # the per-cluster lock stops two requests loading the same model twice
+        with load_lock:
+            with self._lock:
+                if cluster in self._loaded:
+                    self._loaded.move_to_end(cluster)
+                    return self._loaded[cluster][0]
+
+            if time.time() < self._failed.get(cluster, 0):
+                raise RuntimeError(f"Partition {cluster} failed to load recently")
+            cluster_dir = os.path.join(self.partitions_dir, cluster)
+            try:
+                bundle = ModelBundle.load_dir(cluster_dir, f"partition-{cluster}",
+                                              self.stop_database, self.eta_table)
+                bundle.load_model()
+            except Exception:
+                with self._lock:
+                    self._failed[cluster] = time.time() + LOAD_RETRY_SECONDS
+                    self._publish_status()
+                raise
+            size_bytes = directory_size(cluster_dir)
+            print(f"📦 Loaded partition {cluster} ({size_bytes / 1024**2:.1f} MB)")
+
+            with self._lock:
+                self._failed.pop(cluster, None)
+                self._loaded[cluster] = (bundle, size_bytes)
+                self._loaded_bytes += size_bytes
+                self.loads += 1
+                # Requests still holding an evicted bundle finish normally
+                while self._loaded_bytes > self.memory_budget_bytes and len(self._loaded) > 1:
+                    evicted, (_, evicted_bytes) = self._loaded.popitem(last=False)
+                    self._loaded_bytes -= evicted_bytes
+                    self.evictions += 1
+                    print(f"♻️  Evicted partition {evicted}")
+                self._publish_status()
+            return bundle
+
+    def _publish_status(self):
+        if self._worker_status is not None:
+            self._worker_status[os.getpid()] = self._local_status()
+
+    def _local_status(self):
+        return {
+            'pid': os.getpid(),
+            'loaded': list(self._loaded),
+            'loaded_mb': round(self._loaded_bytes / 1024**2, 1),
+            'failed': sorted(self._failed),
+            'loads': self.loads,
+            'evictions': self.evictions
+        }
+
+    def status(self):
+        """Loaded partitions of every live worker (just this process when not pre-forked)"""
+        with self._lock:
+            workers = [self._local_status()]
+        if self._worker_status is not None:
+            workers += [status for pid, status in self._worker_status.items()
+                        if pid != os.getpid() and process_alive(pid)]
+        return {
+            'clusters': len(set(self.route_to_cluster.values())),
+            'budget_mb_per_worker': round(self.memory_budget_bytes / 1024**2, 1),
+            'loads': sum(w['loads'] for w in workers),
+            'evictions': sum(w['evictions'] for w in workers),
+            'workers': sorted(workers, key=lambda w: w['pid'])
+        }
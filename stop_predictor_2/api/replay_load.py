@@ -0,0 +1,223 @@
+#Replay historical GPS pings against the API as if many buses were driving at once.
+#
+#Pings are grouped into per-vehicle trips (vehicle_id if the data has it, else route_id,
+#split wherever the gap between pings is longer than --trip-gap seconds) and each trip is
+#replayed by its own simulated device at N x real time, sending the trip's route_id along.
+#At the end we report throughput and latency percentiles of successful requests, the error
+#rate, and how often the predicted stop matched the recorded next_stop_id.
+#
+#  python replay_load.py --speedup 20 --devices 100
+#  python replay_load.py --in-process --app app_simple     # no server needed, uses Flask's test client
+#  python replay_load.py --url http://localhost:5000 --mode ids --session
+
+import argparse
+import http.client
+import importlib
+import json
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import pandas as pd
+
+DEFAULT_DATA_PATH = '../data/master_bus_data.csv'
+ENDPOINT = '/predict_from_coordinates'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Replay recorded bus GPS traces against the prediction API')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH,
+                        help='raw or processed CSV with route_id, timestamp, latitude, longitude, next_stop_id')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--in-process', action='store_true',
+                        help="call the app through Flask's test client instead of HTTP")
+    parser.add_argument('--app', default='app', help='app module for --in-process (default: app)')
+    parser.add_argument('--devices', type=int, default=50, help='number of trips replayed concurrently')
+    parser.add_argument('--speedup', type=float, default=10.0, help='replay at N x real time')
+    parser.add_argument('--trip-gap', type=int, default=600,
+                        help='seconds without pings that end a trip')
+    parser.add_argument('--min-pings', type=int, default=10, help='skip trips shorter than this')
+    parser.add_argument('--max-pings', type=int, default=200, help='truncate trips longer than this')
+    parser.add_argument('--mode', choices=['ids'], help='ask the API for ID-only responses')
+    parser.add_argument('--session', action='store_true',
+                        help='send a session_id per device (exercises announcement state)')
+    parser.add_argument('--seed', type=int, default=42, help='which trips are picked')
+    return parser.parse_args()
+
+
+def load_trips(path, trip_gap, min_pings, max_pings, count, seed):
+    """Group pings into per-vehicle trips and pick `count` of them"""
+    print(f"Reading pings from {path}...")
+    wanted = ['route_id', 'timestamp', 'latitude', 'longitude', 'next_stop_id', 'vehicle_id']
+    df = pd.read_csv(path, usecols=lambda col: col in wanted)
+    vehicle_col = 'vehicle_id' if 'vehicle_id' in df.columns else 'route_id'
+    df = df.dropna(subset=[vehicle_col, 'timestamp', 'latitude', 'longitude', 'next_stop_id'])
+
+    df = df.sort_values([vehicle_col, 'timestamp']).reset_index(drop=True)
+    new_vehicle = df[vehicle_col] != df[vehicle_col].shift()
+    long_gap = df['timestamp'].diff() > trip_gap
+    df['trip'] = (new_vehicle | long_gap).cumsum()
+
+    sizes = df.groupby('trip').size()
+    eligible = sizes[sizes >= min_pings].index.to_series()
+    print(f"Found {len(sizes):,} trips ({len(eligible):,} with at least {min_pings} pings) "
+          f"grouped by {vehicle_col}")
+
+    chosen = eligible.sample(n=min(count, len(eligible)), random_state=seed)
+    trips = []
+    for _, trip in df[df['trip'].isin(chosen)].groupby('trip'):
+        trip = trip.head(max_pings)
+        trips.append(list(zip(trip['timestamp'], trip['latitude'], trip['longitude'],
+                              trip['next_stop_id'], trip['route_id'])))
+    return trips
+
+
+class HttpClient:
+    """One keep-alive connection per simulated device"""
+
+    def __init__(self, base_url):
+        url = urlparse(base_url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+    def post(self, path, payload):
+        body = json.dumps(payload)
+        try:
+            self.connection.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            # Leave the connection idle so the next request reconnects instead of
+            # failing with CannotSendRequest (e.g. after a worker restart)
+            self.connection.close()
+            raise
+
+
+class InProcessClient:
+    """Calls the Flask app directly, no network or separate server"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_data()
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies_ms = []
+        self.lags_ms = []
+        self.requests = 0
+        self.errors = 0
+        self.compared = 0
+        self.correct = 0
+
+    def record(self, latency_ms, lag_ms, ok, predicted_stop, actual_stop):
+        with self._lock:
+            self.requests += 1
+            self.lags_ms.append(lag_ms)
+            if not ok:
+                # Failures (often instant, e.g. connection refused) would flatter the latencies
+                self.errors += 1
+                return
+            self.latencies_ms.append(latency_ms)
+            if predicted_stop is not None:
+                self.compared += 1
+                self.correct += int(predicted_stop == actual_stop)
+
+
+def predicted_stop_id(body):
+    """stop_id from a full or an ID-only (mode=ids) response"""
+    data = json.loads(body)
+    if 'prediction' in data:
+        return data['prediction'].get('stop_id')
+    return data.get('stop_id')
+
+
+def replay_trip(device_id, trip, client, path, args, results, start_time):
+    """Send this trip's pings on their (sped up) original schedule"""
+    first_ts = trip[0][0]
+    for timestamp, latitude, longitude, next_stop_id, route_id in trip:
+        due = start_time + (timestamp - first_ts) / args.speedup
+        wait = due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+
+        payload = {'latitude': float(latitude), 'longitude': float(longitude), 'route_id': int(route_id)}
+        if args.session:
+            payload['session_id'] = f"replay-{device_id}"
+
+        sent = time.perf_counter()
+        try:
+            status, body = client.post(path, payload)
+            ok = status == 200
+            predicted = predicted_stop_id(body) if ok else None
+        except Exception:
+            ok, predicted = False, None
+        latency_ms = (time.perf_counter() - sent) * 1000
+        lag_ms = max(0.0, sent - due) * 1000
+        results.record(latency_ms, lag_ms, ok, predicted, int(next_stop_id))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def print_report(results, elapsed, num_trips):
+    latencies = sorted(results.latencies_ms)
+    lags = sorted(results.lags_ms)
+    succeeded = len(latencies)
+    error_rate = results.errors / results.requests if results.requests else 0.0
+
+    print("\n📊 Replay results")
+    print(f"Devices (trips):     {num_trips}")
+    print(f"Requests:            {results.requests:,} ({succeeded:,} ok, {results.errors:,} errors)")
+    print(f"Error rate:          {error_rate:.2%}")
+    print(f"Wall time:           {elapsed:.1f} s")
+    print(f"Throughput (ok):     {succeeded / elapsed if elapsed else 0:.1f} req/s")
+    print(f"Latency p50/p90/p99: {percentile(latencies, 50):.1f} / {percentile(latencies, 90):.1f} / "
+          f"{percentile(latencies, 99):.1f} ms (max {latencies[-1] if latencies else 0:.1f} ms)")
+    print(f"Schedule lag p99:    {percentile(lags, 99):.1f} ms (high = client or server saturated)")
+    if results.compared:
+        print(f"Next-stop accuracy:  {results.correct / results.compared:.2%} "
+              f"({results.correct:,}/{results.compared:,})")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    trips = load_trips(args.data, args.trip_gap, args.min_pings, args.max_pings, args.devices, args.seed)
+    if not trips:
+        raise SystemExit("❌ No trips to replay")
+
+    path = ENDPOINT
+    if args.mode:
+        path += '?' + urlencode({'mode': args.mode})
+
+    if args.in_process:
+        app = importlib.import_module(args.app).app
+        make_client = lambda: InProcessClient(app)
+    else:
+        make_client = lambda: HttpClient(args.url)
+
+    longest = max((trip[-1][0] - trip[0][0]) / args.speedup for trip in trips)
+    print(f"🚌 Replaying {len(trips)} trips, {sum(len(t) for t in trips):,} pings "
+          f"at {args.speedup:g}x (~{longest:.0f} s)...")
+
+    results = Results()
+    start_time = time.perf_counter()
+    threads = [
+        threading.Thread(target=replay_trip,
+                         args=(i, trip, make_client(), path, args, results, start_time),
+                         daemon=True)
+        for i, trip in enumerate(trips)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print_report(results, time.perf_counter() - start_time, len(trips))
@@ -0,0 +1,141 @@
+# Opt-in compact encodings for prediction responses.
+#
+# Clients can ask for less than the full nested response:
+#   fields=prediction.stop_id,prediction.confidence   keep only these (dotted) paths
+#   mode=ids                                          flat, ID-only response, names come from /stop_table
+#   format=msgpack (or Accept: application/msgpack)   binary MessagePack instead of JSON
+# Each option can be given in the query string or in the JSON body.
+# Without any of them the response is exactly what it was before.
+
+import json
+
+from flask import Response, jsonify
+
+# MessagePack is optional, asking for it without it installed gets a 406
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+MODES = (None, 'ids')
+FORMATS = (None, 'json', 'msgpack')
+
+# Serialized stop table, rebuilt only when a different stop database is passed in
+_stop_table_cache = {'source': None, 'body': None}
+
+
+class ResponseOptionError(ValueError):
+    """Unusable fields/mode/format, raised before any prediction is made"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_response_options(request, data):
+    """Read fields/mode/format from the query string, falling back to the JSON body"""
+    def option(name):
+        value = request.args.get(name)
+        if value is None:
+            value = data.get(name)
+        return value
+
+    fields = option('fields')
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    elif fields is not None and (not isinstance(fields, list) or
+                                 not all(isinstance(f, str) for f in fields)):
+        raise ResponseOptionError("fields must be a comma-separated string or a list of strings")
+
+    mode = option('mode')
+    if mode not in MODES:
+        raise ResponseOptionError(f"Unknown mode {mode!r}, expected 'ids'")
+
+    encoding = option('format')
+    if encoding is None and MSGPACK_MIMETYPE in request.headers.get('Accept', ''):
+        encoding = 'msgpack'
+    if encoding not in FORMATS:
+        raise ResponseOptionError(f"Unknown format {encoding!r}, expected 'json' or 'msgpack'")
+    if encoding == 'msgpack' and msgpack is None:
+        raise ResponseOptionError("MessagePack is not available on this server", 406)
+
+    return {
+        'fields': fields or None,
+        'mode': mode,
+        'format': encoding
+    }
+
+
+def to_id_only(response):
+    """Flat response with IDs and numbers only, distance_meters is to the predicted stop as in the full response"""
+    prediction = response['prediction']
+    nearest_stop = response['current_location']['nearest_stop']
+    compact = {
+        'stop_id': prediction['stop_id'],
+        'confidence': round(prediction['confidence'], 4),
+        'nearest_stop_id': nearest_stop['stop_id'],
+        'nearest_distance_meters': round(nearest_stop['distance_meters'], 1)
+    }
+    if prediction.get('distance_meters') is not None:
+        compact['distance_meters'] = round(prediction['distance_meters'], 1)
+    if 'eta_seconds' in prediction:
+        compact['eta_seconds'] = prediction['eta_seconds']
+    if 'play_audio' in response:
+        compact['play_audio'] = response['play_audio']
+    return compact
+
+
+def project(response, fields):
+    """Keep only the requested dotted paths, e.g. 'prediction.stop_id'"""
+    projected = {}
+    for path in fields:
+        source = response
+        keys = path.split('.')
+        try:
+            for key in keys:
+                source = source[key]
+        except (KeyError, TypeError):
+            continue
+
+        target = projected
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = source
+    return projected
+
+
+def encode_response(response, status_code, options):
+    """Build the Flask response for a successful prediction payload"""
+    if status_code == 200:
+        if options['mode'] == 'ids':
+            response = to_id_only(response)
+        if options['fields']:
+            response = project(response, options['fields'])
+
+    if options['format'] == 'msgpack':
+        return Response(msgpack.packb(response, use_bin_type=True),
+                        status=status_code, mimetype=MSGPACK_MIMETYPE)
+
+    if options['mode'] or options['fields'] or options['format']:
+        body = json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+        return Response(body, status=status_code, mimetype='application/json')
+
+    return jsonify(response), status_code
+
+
+def stop_table_response(request, stop_database):
+    """Cacheable {stop_id: [english, hindi, lat, lon]} table for ID-only clients"""
+    if _stop_table_cache['source'] is not stop_database:
+        table = {
+            stop_id: [info['english'], info.get('hindi', ''), info['latitude'], info['longitude']]
+            for stop_id, info in stop_database.items()
+        }
+        _stop_table_cache['body'] = json.dumps(table, ensure_ascii=False, separators=(',', ':'))
+        _stop_table_cache['source'] = stop_database
+
+    response = Response(_stop_table_cache['body'], mimetype='application/json')
+    response.cache_control.public = True
+    response.cache_control.max_age = 24 * 60 * 60
+    response.add_etag()
+    return response.make_conditional(request)
@@ -0,0 +1,314 @@
+# Production entry point for the API (instead of app.run(debug=True)).
+#
+# The app module (stop database, encoders, scaler, ETA table) is imported ONCE in the
+# parent, then N workers are forked and share those read-only pages copy-on-write.
+# Unix only (os.fork).
+#
+# State that must not depend on which worker answers (per-rider announcement sessions,
+# shadow-scoring stats, loaded partitions) lives in a multiprocessing.Manager process
+# started before forking: the app module's share_state(manager) hook moves it there.
+#
+#   python serve.py --workers 4 --port 5000              # serves app.py
+#   python serve.py --app app_simple --workers 2
+#
+# Signals to the parent process:
+#   HUP        graceful rolling restart (one worker at a time, the others keep serving)
+#   TERM/INT   graceful shutdown
+#
+# GET /health/workers on any worker reports every worker's pid, uptime, requests and heartbeat.
+#
+# App module hooks, all optional:
+#   share_state(manager)   in the parent before forking, see above
+#   check_for_update()     polled in the parent, True triggers a rolling restart (new model version)
+#   on_worker_start(slot)  in each worker after fork
+#
+# TensorFlow must not start in the parent: its runtime and thread pools don't survive
+# fork and children can hang. app.py only records the model path at import, and each
+# worker builds its own Keras model in on_worker_start(), so the model weights are
+# NOT shared (one copy per worker). The same goes for route partitions: each worker
+# keeps up to PARTITION_MEMORY_BUDGET_MB of them, so size it as total memory / --workers.
+
+import argparse
+import gc
+import importlib
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from flask import jsonify
+from werkzeug.serving import make_server
+
+# A worker whose heartbeat is older than this is killed and replaced
+HEARTBEAT_TIMEOUT = 30
+# How long a worker gets to finish in-flight requests before SIGKILL
+GRACEFUL_TIMEOUT = 20
+# How often the parent asks the app module whether it needs a rolling restart
+UPDATE_CHECK_INTERVAL = 10
+
+# Per-worker slot in shared memory
+PID, STARTED_AT, REQUESTS, ERRORS, HEARTBEAT = range(5)
+SLOT_SIZE = 5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Pre-fork multi-worker server for the bus stop API')
+    parser.add_argument('--app', default='app', help='module that defines the Flask `app` (default: app)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    return parser.parse_args()
+
+
+def add_worker_health_route(app, stats, num_workers):
+    """GET /health/workers, readable from any worker because stats live in shared memory"""
+    def workers_health():
+        now = time.time()
+        workers = []
+        for slot in range(num_workers):
+            base = slot * SLOT_SIZE
+            pid = int(stats[base + PID])
+            heartbeat_age = now - stats[base + HEARTBEAT] if pid else None
+            workers.append({
+                'slot': slot,
+                'pid': pid,
+                'uptime_seconds': round(now - stats[base + STARTED_AT], 1) if pid else 0,
+                'requests': int(stats[base + REQUESTS]),
+                'errors': int(stats[base + ERRORS]),
+                'heartbeat_age_seconds': round(heartbeat_age, 1) if pid else None,
+                'healthy': bool(pid) and heartbeat_age < HEARTBEAT_TIMEOUT
+            })
+        return jsonify({
+            'served_by': os.getpid(),
+            'workers': workers,
+            'healthy_workers': sum(w['healthy'] for w in workers)
+        })
+
+    app.add_url_rule('/health/workers', 'workers_health', workers_health, methods=['GET'])
+
+
+def count_requests(wsgi_app, stats, slot):
+    """WSGI middleware that counts requests and 5xx responses into this worker's slot"""
+    lock = threading.Lock()
+    base = slot * SLOT_SIZE
+
+    def middleware(environ, start_response):
+        def counting_start_response(status, headers, exc_info=None):
+            with lock:
+                stats[base + REQUESTS] += 1
+                if status.startswith('5'):
+                    stats[base + ERRORS] += 1
+            return start_response(status, headers, exc_info)
+        return wsgi_app(environ, counting_start_response)
+
+    return middleware
+
+
+def run_worker(app_module, listener, stats, slot, host, port):
+    """Body of a forked worker, never returns"""
+    # First thing: the inherited arbiter handler would only set a flag nobody reads here.
+    # Until the server exists a SIGTERM just means "don't start serving".
+    stopping = threading.Event()
+    server = None
+
+    def on_term(*_):
+        stopping.set()
+        # shutdown() waits for serve_forever to return, so it cannot run in the signal handler itself
+        if server is not None:
+            threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, on_term)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    exit_code = 1
+    try:
+        base = slot * SLOT_SIZE
+        for i in range(SLOT_SIZE):
+            stats[base + i] = 0
+        stats[base + PID] = os.getpid()
+        stats[base + STARTED_AT] = stats[base + HEARTBEAT] = time.time()
+
+        # Per-process setup such as background threads, which don't survive fork
+        if hasattr(app_module, 'on_worker_start'):
+            app_module.on_worker_start(slot)
+
+        app = app_module.app
+        app.wsgi_app = count_requests(app.wsgi_app, stats, slot)
+        server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+        # Werkzeug runs handlers on daemon threads and closes the connection after every
+        # response, so with non-daemon threads server_close() waits for exactly the in-flight requests
+        server.daemon_threads = False
+
+        # Beat from the accept loop itself, so a wedged server (not just a dead one) is noticed
+        def heartbeat():
+            stats[base + HEARTBEAT] = time.time()
+
+        server.service_actions = heartbeat
+
+        if not stopping.is_set():
+            print(f"👷 Worker {slot} started (pid {os.getpid()})")
+            server.serve_forever()
+        # Stop accepting, then let in-flight requests finish (the arbiter SIGKILLs after GRACEFUL_TIMEOUT)
+        server.server_close()
+        exit_code = 0
+    except Exception:
+        traceback.print_exc()
+    finally:
+        os._exit(exit_code)
+
+
+class Arbiter:
+    """Parent process: forks workers, replaces dead or stuck ones, handles signals"""
+
+    def __init__(self, app_module, listener, host, port, num_workers):
+        self.app_module = app_module
+        self.listener = listener
+        self.host = host
+        self.port = port
+        self.num_workers = num_workers
+        self.stats = multiprocessing.RawArray('d', num_workers * SLOT_SIZE)
+        self.workers = {}  # pid -> slot
+        self.stopping = False
+        self.reload_requested = False
+        self.next_update_check = time.time() + UPDATE_CHECK_INTERVAL
+
+    def spawn(self, slot):
+        # Give the new worker a full heartbeat window before it is checked
+        self.stats[slot * SLOT_SIZE + HEARTBEAT] = time.time()
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.app_module, self.listener, self.stats, slot, self.host, self.port)
+        self.workers[pid] = slot
+
+    def stop_worker(self, pid):
+        """SIGTERM, wait for in-flight requests, SIGKILL if it takes too long"""
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        deadline = time.time() + GRACEFUL_TIMEOUT
+        while time.time() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                break
+            time.sleep(0.1)
+        else:
+            print(f"⚠️  Worker {pid} did not exit in {GRACEFUL_TIMEOUT}s, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        slot = self.workers.pop(pid, None)
+        if slot is not None:
+            self.stats[slot * SLOT_SIZE + PID] = 0
+
+    def rolling_restart(self):
+        print("🔄 Rolling restart of workers...")
+        for pid, slot in list(self.workers.items()):
+            self.stop_worker(pid)
+            if self.stopping:
+                return
+            self.spawn(slot)
+
+    def reap_and_check(self):
+        """Replace workers that exited or stopped sending heartbeats"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            slot = self.workers.pop(pid, None)
+            if slot is not None and not self.stopping:
+                print(f"⚠️  Worker {slot} (pid {pid}) exited with status {status}, restarting")
+                self.spawn(slot)
+
+        now = time.time()
+        for pid, slot in list(self.workers.items()):
+            if now - self.stats[slot * SLOT_SIZE + HEARTBEAT] > HEARTBEAT_TIMEOUT:
+                print(f"⚠️  Worker {slot} (pid {pid}) missed its heartbeat, replacing it")
+                self.stop_worker(pid)
+                self.spawn(slot)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        for slot in range(self.num_workers):
+            self.spawn(slot)
+
+        while not self.stopping:
+            if self.reload_requested or self.app_updated():
+                self.reload_requested = False
+                self.rolling_restart()
+            self.reap_and_check()
+            time.sleep(0.5)
+
+        print("🛑 Shutting down workers...")
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        self.listener.close()
+
+    def app_updated(self):
+        """Let the app reload its shared state (e.g. a new model version) in the parent"""
+        if not hasattr(self.app_module, 'check_for_update') or time.time() < self.next_update_check:
+            return False
+        self.next_update_check = time.time() + UPDATE_CHECK_INTERVAL
+        try:
+            updated = bool(self.app_module.check_for_update())
+        except Exception as e:
+            print(f"⚠️  Warning: Update check failed: {e}")
+            return False
+        if updated:
+            # New workers share the reloaded pages too
+            gc.collect()
+            gc.freeze()
+        return updated
+
+    def _on_hup(self, signum, frame):
+        self.reload_requested = True
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    print(f"📦 Loading '{args.app}' once in the parent process (pid {os.getpid()})...")
+    app_module = importlib.import_module(args.app)
+    if 'tensorflow' in sys.modules:
+        print("⚠️  Warning: TensorFlow was imported in the parent, workers may hang after fork")
+
+    # Started before the listener exists, so the manager process doesn't hold the port open
+    manager = None
+    if hasattr(app_module, 'share_state'):
+        manager = multiprocessing.Manager()
+        app_module.share_state(manager)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((args.host, args.port))
+    listener.listen(128)
+    listener.set_inheritable(True)
+
+    arbiter = Arbiter(app_module, listener, args.host, args.port, args.workers)
+    add_worker_health_route(app_module.app, arbiter.stats, args.workers)
+
+    # Move everything loaded so far out of the GC's reach, so collections in the
+    # workers don't touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    print(f"🚌 Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    arbiter.run()
+    if manager is not None:
+        manager.shutdown()
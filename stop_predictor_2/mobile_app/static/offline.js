@@ -0,0 +1,245 @@
+// On-device prediction using the bundle built by api/build_offline_bundle.py.
+// Mirrors predict_from_coordinates_internal in api/app.py so responses have the same shape.
+
+const API_URL = "http://localhost:5000";
+const OFFLINE_BUNDLE_URL = "offline_bundle.json";
+
+// Below this confidence we ask the server (if it is reachable)
+const OFFLINE_CONFIDENCE_THRESHOLD = 0.6;
+
+let offlineBundle = null;
+
+async function loadOfflineBundle() {
+  try {
+    const response = await fetch(OFFLINE_BUNDLE_URL);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    offlineBundle = prepareBundle(await response.json());
+    console.log(
+      `Offline bundle loaded: ${Object.keys(offlineBundle.stops).length} stops`
+    );
+  } catch (error) {
+    console.warn("Offline bundle not available, using server only:", error);
+    offlineBundle = null;
+  }
+}
+
+function decodeBase64(text) {
+  return Uint8Array.from(atob(text), (c) => c.charCodeAt(0)).buffer;
+}
+
+function prepareBundle(bundle) {
+  if (bundle.model) {
+    // Decode weights once so every prediction is just arithmetic
+    bundle.model.layers = bundle.model.layers.map((layer) => ({
+      ...layer,
+      kernel: new Int8Array(decodeBase64(layer.kernel)),
+      bias: new Float32Array(decodeBase64(layer.bias)),
+    }));
+    bundle.model.stopIndex = new Map(
+      bundle.model.stop_classes.map((stopId, index) => [stopId, index])
+    );
+  }
+  return bundle;
+}
+
+function calculateDistance(lat1, lon1, lat2, lon2) {
+  const R = 6371000; // Earth radius in meters
+  const toRad = (deg) => (deg * Math.PI) / 180;
+  const dlat = toRad(lat2 - lat1);
+  const dlon = toRad(lon2 - lon1);
+  const a =
+    Math.sin(dlat / 2) ** 2 +
+    Math.cos(toRad(lat1)) * Math.cos(toRad(lat2)) * Math.sin(dlon / 2) ** 2;
+  return R * 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
+}
+
+function findNearestStopOffline(latitude, longitude) {
+  let nearestId = null;
+  let minDistance = Infinity;
+
+  for (const [stopId, stop] of Object.entries(offlineBundle.stops)) {
+    const distance = calculateDistance(latitude, longitude, stop[2], stop[3]);
+    if (distance < minDistance) {
+      minDistance = distance;
+      nearestId = stopId;
+    }
+  }
+
+  if (nearestId === null) return null;
+  const stop = offlineBundle.stops[nearestId];
+  return {
+    stop_id: parseInt(nearestId, 10),
+    english_name: stop[0],
+    hindi_name: stop[1],
+    distance_meters: minDistance,
+    coordinates: { latitude: stop[2], longitude: stop[3] },
+  };
+}
+
+function buildFeatureRow(latitude, longitude, prevStopIndex) {
+  const model = offlineBundle.model;
+  const now = new Date();
+  const hour = now.getHours();
+  const day = now.getDay();
+
+  // Same defaults as app.py
+  const raw = {
+    latitude: latitude,
+    longitude: longitude,
+    route_id: model.default_route_index,
+    speed: 8.0,
+    acceleration: 0,
+    distance_moved: 100,
+    hour: hour,
+    is_weekend: day === 0 || day === 6 ? 1 : 0,
+    is_peak_hours: [7, 8, 9, 17, 18, 19].includes(hour) ? 1 : 0,
+    prev_stop: prevStopIndex,
+    stop_sequence: 1,
+    total_stops_in_trip: 20,
+  };
+
+  return Float32Array.from(model.feature_columns, (col) => {
+    const scaling = model.scaler[col];
+    return scaling ? (raw[col] - scaling[0]) / scaling[1] : raw[col];
+  });
+}
+
+function runModel(input) {
+  let x = input;
+  for (const layer of offlineBundle.model.layers) {
+    const out = new Float32Array(layer.units);
+    for (let j = 0; j < layer.units; j++) {
+      let sum = 0;
+      for (let i = 0; i < layer.inputs; i++) {
+        sum += x[i] * layer.kernel[i * layer.units + j];
+      }
+      out[j] = sum * layer.scale + layer.bias[j];
+    }
+
+    if (layer.activation === "relu") {
+      for (let j = 0; j < out.length; j++) out[j] = Math.max(0, out[j]);
+    } else if (layer.activation === "softmax") {
+      const max = Math.max(...out);
+      let total = 0;
+      for (let j = 0; j < out.length; j++) {
+        out[j] = Math.exp(out[j] - max);
+        total += out[j];
+      }
+      for (let j = 0; j < out.length; j++) out[j] /= total;
+    }
+    x = out;
+  }
+  return x;
+}
+
+function predictNextStopOffline(latitude, longitude, nearestStop) {
+  const model = offlineBundle.model;
+  const prevStopIndex = model
+    ? model.stopIndex.get(nearestStop.stop_id)
+    : undefined;
+
+  if (prevStopIndex !== undefined) {
+    const probabilities = runModel(
+      buildFeatureRow(latitude, longitude, prevStopIndex)
+    );
+    let best = 0;
+    for (let j = 1; j < probabilities.length; j++) {
+      if (probabilities[j] > probabilities[best]) best = j;
+    }
+    return {
+      stopId: model.stop_classes[best],
+      confidence: probabilities[best],
+    };
+  }
+
+  // No model (or stop unknown to the encoder): most frequent next stop
+  const transitions = offlineBundle.transitions[String(nearestStop.stop_id)];
+  if (transitions && transitions.length > 0) {
+    return { stopId: transitions[0][0], confidence: transitions[0][1] };
+  }
+  return null;
+}
+
+function predictOffline(latitude, longitude) {
+  if (!offlineBundle) return null;
+
+  const nearestStop = findNearestStopOffline(latitude, longitude);
+  if (!nearestStop) return null;
+
+  const predicted = predictNextStopOffline(latitude, longitude, nearestStop);
+  if (!predicted) return null;
+
+  const stop = offlineBundle.stops[String(predicted.stopId)];
+  const englishName = stop ? stop[0] : `Stop ${predicted.stopId}`;
+  const hindiName = stop ? stop[1] : `स्टॉप ${predicted.stopId}`;
+  const distanceMeters = stop
+    ? calculateDistance(latitude, longitude, stop[2], stop[3])
+    : null;
+
+  return {
+    current_location: {
+      coordinates: { latitude: latitude, longitude: longitude },
+      nearest_stop: nearestStop,
+    },
+    prediction: {
+      stop_id: predicted.stopId,
+      stop_name_english: englishName,
+      stop_name_hindi: hindiName,
+      confidence: predicted.confidence,
+      distance_meters: distanceMeters,
+      model_version: offlineBundle.model_version,
+    },
+    audio: {
+      english: `Next stop is ${englishName}`,
+      hindi: `Agalaaaa staation  haaaa ${hindiName}`,
+    },
+    play_audio: predicted.confidence > OFFLINE_CONFIDENCE_THRESHOLD,
+    source: "offline",
+  };
+}
+
+async function fetchServerPrediction(latitude, longitude, sessionId) {
+  const response = await fetch(`${API_URL}/predict_from_coordinates`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      latitude: latitude,
+      longitude: longitude,
+      session_id: sessionId,
+    }),
+  });
+
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+  return response.json();
+}
+
+// Predict on-device first, only go to the server when we are not confident.
+// If the server is unreachable (underground, dead zone) keep the offline answer.
+// Pass a sessionId to let the server decide when to announce (see api/announcements.py).
+async function predictWithFallback(latitude, longitude, sessionId) {
+  const offline = predictOffline(latitude, longitude);
+  if (
+    offline &&
+    offline.prediction.confidence >= OFFLINE_CONFIDENCE_THRESHOLD
+  ) {
+    return offline;
+  }
+
+  try {
+    return await fetchServerPrediction(latitude, longitude, sessionId);
+  } catch (error) {
+    if (offline) {
+      console.warn("Server unreachable, using offline prediction:", error);
+      return offline;
+    }
+    throw error;
+  }
+}
+
+window.addEventListener("load", loadOfflineBundle);
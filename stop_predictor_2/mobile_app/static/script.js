@@ -16,7 +16,7 @@ async function predictStop() {
   predictBtn.disabled = true;
 
   try {
-    const response = await fetch("http://localhost:5000/predict_from_demo", {
+    const response = await fetch(`${API_URL}/predict_from_demo`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -103,55 +103,11 @@ async function predictFromCurrentLocation() {
     )}, ${longitude.toFixed(4)}`;
     locationStatus.style.display = "block";
 
-    // Send coordinates to API
-    const response = await fetch(
-      "http://localhost:5000/predict_from_coordinates",
-      {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          latitude: latitude,
-          longitude: longitude,
-        }),
-      }
-    );
-
-    if (!response.ok) {
-      throw new Error(`HTTP error! status: ${response.status}`);
-    }
-
-    const data = await response.json();
+    // Predict on-device, falling back to the API on low confidence
+    const data = await predictWithFallback(latitude, longitude);
 
-    // Update location info
-    const nearestStop = data.current_location.nearest_stop;
-    document.getElementById("nearestStopInfo").innerHTML = `<strong>${
-      nearestStop.english_name
-    }</strong><br>
-             Distance: ${nearestStop.distance_meters.toFixed(0)} meters away`;
-    locationInfo.style.display = "block";
-
-    // Update prediction
-    document.getElementById("englishStop").textContent =
-      data.prediction.stop_name_english;
-    document.getElementById("hindiStop").textContent =
-      data.prediction.stop_name_hindi;
-    document.getElementById("confidence").textContent = `Confidence: ${(
-      data.prediction.confidence * 100
-    ).toFixed(1)}%`;
-
-    // Store current prediction for audio
-    currentPrediction = data;
-
-    // Hide loading, show results
     loading.classList.remove("active");
-    predictionCard.classList.add("active");
-
-    // Auto-play both announcements
-    if (data.play_audio) {
-      setTimeout(() => playBothAnnouncements(), 1000);
-    }
+    showPrediction(data);
   } catch (error) {
     console.error("Location/Prediction error:", error);
     if (error.code === 1) {
@@ -177,6 +133,225 @@ async function predictFromCurrentLocation() {
   }
 }
 
+function showPrediction(data) {
+  // Update location info
+  const nearestStop = data.current_location.nearest_stop;
+  document.getElementById("nearestStopInfo").innerHTML = `<strong>${
+    nearestStop.english_name
+  }</strong><br>
+             Distance: ${nearestStop.distance_meters.toFixed(0)} meters away`;
+  document.getElementById("locationInfo").style.display = "block";
+
+  // Update prediction
+  document.getElementById("englishStop").textContent =
+    data.prediction.stop_name_english;
+  document.getElementById("hindiStop").textContent =
+    data.prediction.stop_name_hindi;
+  document.getElementById("confidence").textContent = `Confidence: ${(
+    data.prediction.confidence * 100
+  ).toFixed(1)}%`;
+
+  // Store current prediction for audio
+  currentPrediction = data;
+
+  document.getElementById("predictionCard").classList.add("active");
+
+  // Auto-play both announcements
+  if (data.play_audio) {
+    setTimeout(() => playBothAnnouncements(), 1000);
+  }
+}
+
+// Live tracking: how often and after how much movement we predict again,
+// depending on how far we are from the predicted next stop.
+const TRACKING_TIERS = [
+  { withinMeters: 150, minIntervalMs: 3000, minDisplacementMeters: 10 },
+  { withinMeters: 500, minIntervalMs: 10000, minDisplacementMeters: 30 },
+  { withinMeters: Infinity, minIntervalMs: 30000, minDisplacementMeters: 100 },
+];
+
+// Same rules as api/announcements.py, used for predictions made on-device
+const ANNOUNCE_MIN_PINGS = 2;
+const ANNOUNCED_HISTORY = 20;
+
+const tracking = {
+  watchId: null,
+  sessionId: null,
+  inFlight: false,
+  lastSent: null, // { latitude, longitude, time }
+  targetStop: null, // { latitude, longitude } of the predicted stop, if known
+  targetDistance: Infinity, // distance to the predicted stop at the last prediction
+  candidateStop: null,
+  streak: 0,
+  announcedStops: [], // most recent last
+};
+
+function newSessionId() {
+  if (window.crypto && crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+}
+
+// Server responses already carry the session decision; offline ones need it here.
+// The server never sees pings answered on-device, so a stop announced from an
+// offline prediction is also suppressed when the server later announces it.
+function applyAnnouncementRules(data) {
+  const stopId = data.prediction.stop_id;
+  const alreadyAnnounced = tracking.announcedStops.includes(stopId);
+
+  if (data.source === "offline") {
+    if (!data.play_audio) {
+      tracking.candidateStop = null;
+      tracking.streak = 0;
+    } else {
+      tracking.streak =
+        stopId === tracking.candidateStop ? tracking.streak + 1 : 1;
+      tracking.candidateStop = stopId;
+      data.play_audio =
+        tracking.streak >= ANNOUNCE_MIN_PINGS && !alreadyAnnounced;
+    }
+  } else if (alreadyAnnounced) {
+    data.play_audio = false;
+  }
+
+  if (data.play_audio) {
+    tracking.announcedStops.push(stopId);
+    if (tracking.announcedStops.length > ANNOUNCED_HISTORY) {
+      tracking.announcedStops.shift();
+    }
+  }
+  return data;
+}
+
+function trackingTier(estimatedDistance) {
+  return TRACKING_TIERS.find((tier) => estimatedDistance <= tier.withinMeters);
+}
+
+// Remember where the predicted stop is, so each fix can be measured against it
+function updateTrackingTarget(data) {
+  const stop =
+    offlineBundle && offlineBundle.stops[String(data.prediction.stop_id)];
+  tracking.targetStop = stop ? { latitude: stop[2], longitude: stop[3] } : null;
+  const distance = data.prediction.distance_meters;
+  tracking.targetDistance =
+    distance === undefined || distance === null ? Infinity : distance;
+}
+
+function shouldSendPosition(latitude, longitude, now) {
+  if (!tracking.lastSent) return true;
+
+  const moved = calculateDistance(
+    tracking.lastSent.latitude,
+    tracking.lastSent.longitude,
+    latitude,
+    longitude
+  );
+  let estimatedDistance;
+  if (tracking.targetStop) {
+    estimatedDistance = calculateDistance(
+      latitude,
+      longitude,
+      tracking.targetStop.latitude,
+      tracking.targetStop.longitude
+    );
+  } else {
+    // Stop not in the offline bundle: assume we moved towards it,
+    // so we speed up before overshooting it
+    estimatedDistance = Math.max(0, tracking.targetDistance - moved);
+  }
+  const tier = trackingTier(estimatedDistance);
+
+  return (
+    moved >= tier.minDisplacementMeters &&
+    now - tracking.lastSent.time >= tier.minIntervalMs
+  );
+}
+
+async function onTrackingPosition(position) {
+  const { latitude, longitude } = position.coords;
+  const now = Date.now();
+
+  if (tracking.inFlight || !shouldSendPosition(latitude, longitude, now)) {
+    return;
+  }
+
+  tracking.inFlight = true;
+  tracking.lastSent = { latitude, longitude, time: now };
+  try {
+    const data = applyAnnouncementRules(
+      await predictWithFallback(latitude, longitude, tracking.sessionId)
+    );
+    updateTrackingTarget(data);
+    document.getElementById("errorMessage").style.display = "none";
+    showPrediction(data);
+  } catch (error) {
+    console.error("Tracking prediction error:", error);
+    showError("Error predicting stop. Will retry as you move.");
+    // Allow the next fix to retry instead of waiting for more movement
+    tracking.lastSent = null;
+  } finally {
+    tracking.inFlight = false;
+  }
+}
+
+function onTrackingError(error) {
+  console.error("Tracking location error:", error);
+  if (error.code === 1) {
+    showError(
+      "Location access denied. Please allow location access or use demo locations."
+    );
+    stopTracking();
+  }
+}
+
+function startTracking() {
+  if (!navigator.geolocation) {
+    showError("Geolocation is not supported by this browser");
+    return;
+  }
+
+  tracking.sessionId = newSessionId();
+  tracking.lastSent = null;
+  tracking.targetStop = null;
+  tracking.targetDistance = Infinity;
+  tracking.candidateStop = null;
+  tracking.streak = 0;
+  tracking.announcedStops = [];
+  tracking.watchId = navigator.geolocation.watchPosition(
+    onTrackingPosition,
+    onTrackingError,
+    {
+      enableHighAccuracy: true,
+      timeout: 10000,
+      maximumAge: 5000,
+    }
+  );
+
+  const trackingBtn = document.getElementById("trackingBtn");
+  trackingBtn.innerHTML = "⏹️ Stop Live Tracking";
+  trackingBtn.setAttribute("aria-pressed", "true");
+}
+
+function stopTracking() {
+  if (tracking.watchId !== null) {
+    navigator.geolocation.clearWatch(tracking.watchId);
+    tracking.watchId = null;
+  }
+
+  const trackingBtn = document.getElementById("trackingBtn");
+  trackingBtn.innerHTML = "🛰️ Start Live Tracking";
+  trackingBtn.setAttribute("aria-pressed", "false");
+}
+
+function toggleTracking() {
+  if (tracking.watchId === null) {
+    startTracking();
+  } else {
+    stopTracking();
+  }
+}
+
 function getCurrentPosition() {
   return new Promise((resolve, reject) => {
     if (!navigator.geolocation) {
@@ -194,8 +369,13 @@ function getCurrentPosition() {
 function playBothAnnouncements() {
   if (!currentPrediction) return;
 
+  // Sessions only get audio text when there is a new announcement
+  const englishText = currentPrediction.audio
+    ? currentPrediction.audio.english
+    : `Next stop is ${currentPrediction.prediction.stop_name_english}`;
+
   // Play English first, then Hindi after a delay
-  speakText(currentPrediction.audio.english, "en-US");
+  speakText(englishText, "en-US");
 
   // Play Hindi after English finishes (approx 3 seconds)
   setTimeout(() => {
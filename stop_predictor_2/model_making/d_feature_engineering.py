@@ -5,6 +5,10 @@ import numpy as np
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 import pickle
 from math import radians, sin, cos, sqrt, atan2
+import training_cache
+
+# Timestamps are UTC epoch seconds; time features use the city's local time, as the API does (api/eta.py)
+TIMEZONE = 'Asia/Kolkata'
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two GPS points in meters"""
@@ -30,7 +34,7 @@ def create_features(df):
     df = df.sort_values(['route_id', 'timestamp']).reset_index(drop=True)
     
     # Convert timestamp to datetime features
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
+    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s', utc=True).dt.tz_convert(TIMEZONE)
     df['hour'] = df['datetime'].dt.hour
     df['day_of_week'] = df['datetime'].dt.dayofweek
     df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
@@ -84,6 +88,21 @@ def prepare_model_data(df):
         'prev_stop', 'stop_sequence', 'total_stops_in_trip'
     ]
     
+    numerical_cols = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed', 'acceleration', 'stop_sequence', 'total_stops_in_trip']
+    
+    # Reuse the encoded matrix if these exact rows were already prepared with this config
+    feature_config = {
+        'pipeline': 'd_feature_engineering',
+        'features': feature_columns,
+        'numerical': numerical_cols,
+        'target': 'next_stop_id'
+    }
+    cache_key = training_cache.cache_key(df[feature_columns + ['next_stop_id']], feature_config)
+    cached = training_cache.load(cache_key)
+    if cached is not None:
+        X_cached, y_encoded = cached
+        return pd.DataFrame(X_cached, columns=feature_columns, copy=False), y_encoded
+    
     X = df[feature_columns]
     y = df['next_stop_id']
     
@@ -97,7 +116,6 @@ def prepare_model_data(df):
     
     # Scale numerical features
     scaler = StandardScaler()
-    numerical_cols = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed', 'acceleration', 'stop_sequence', 'total_stops_in_trip']
     X[numerical_cols] = scaler.fit_transform(X[numerical_cols])
     
     # Save encoders and scaler
@@ -112,6 +130,15 @@ def prepare_model_data(df):
     print(f"Number of unique stops to predict: {len(np.unique(y_encoded))}")
     print("Encoders and scaler saved!")
     
+    # Same dtypes as a cache hit returns
+    X = X.astype(np.float32)
+    y_encoded = y_encoded.astype(np.int32)
+    training_cache.save(cache_key, X.to_numpy(), y_encoded, {
+        'route_encoder.pkl': route_encoder,
+        'stop_encoder.pkl': stop_encoder,
+        'scaler.pkl': scaler
+    }, feature_config)
+    
     return X, y_encoded
 
 # Main execution
@@ -7,14 +7,11 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 import pickle
 import time
+import training_cache
 
 print("Starting model training with fresh encoders...")
 
-# Load prepared data
-df = pd.read_csv('../data/final_training_data.csv')
-
-# Fix prev_stop column
-df['prev_stop'] = df['prev_stop'].fillna(0).astype(int)
+DATA_PATH = '../data/final_training_data.csv'
 
 # Prepare features and target
 feature_columns = [
@@ -22,31 +19,59 @@ feature_columns = [
     'distance_moved', 'hour', 'is_weekend', 'is_peak_hours', 
     'prev_stop', 'stop_sequence', 'total_stops_in_trip'
 ]
-
-X = df[feature_columns]
-y = df['next_stop_id']
-
-# Create NEW encoders with current data
-route_encoder = LabelEncoder()
-stop_encoder = LabelEncoder()
-
-X_encoded = X.copy()
-X_encoded['route_id'] = route_encoder.fit_transform(X_encoded['route_id'])
-X_encoded['prev_stop'] = stop_encoder.fit_transform(X_encoded['prev_stop'].astype(str))
-y_encoded = stop_encoder.fit_transform(y)
-
-# Scale numerical features
-scaler = StandardScaler()
 numerical_cols = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed', 'acceleration', 'stop_sequence', 'total_stops_in_trip']
-X_encoded[numerical_cols] = scaler.fit_transform(X_encoded[numerical_cols])
 
-# Save the NEW encoders
-with open('route_encoder.pkl', 'wb') as f:
-    pickle.dump(route_encoder, f)
-with open('stop_encoder.pkl', 'wb') as f:
-    pickle.dump(stop_encoder, f)
-with open('scaler.pkl', 'wb') as f:
-    pickle.dump(scaler, f)
+# Anything that changes how X/y are built must be in here, so it changes the cache key
+FEATURE_CONFIG = {
+    'pipeline': 'e_model_training',
+    'features': feature_columns,
+    'numerical': numerical_cols,
+    'target': 'next_stop_id'
+}
+
+cache_key = training_cache.cache_key(DATA_PATH, FEATURE_CONFIG)
+cached = training_cache.load(cache_key)
+
+if cached is not None:
+    X_encoded, y_encoded = cached
+else:
+    # Load prepared data
+    df = pd.read_csv(DATA_PATH)
+
+    # Fix prev_stop column
+    df['prev_stop'] = df['prev_stop'].fillna(0).astype(int)
+
+    X = df[feature_columns]
+    y = df['next_stop_id']
+
+    # Create NEW encoders with current data
+    route_encoder = LabelEncoder()
+    stop_encoder = LabelEncoder()
+
+    X_encoded = X.copy()
+    X_encoded['route_id'] = route_encoder.fit_transform(X_encoded['route_id'])
+    X_encoded['prev_stop'] = stop_encoder.fit_transform(X_encoded['prev_stop'].astype(str))
+    y_encoded = stop_encoder.fit_transform(y)
+
+    # Scale numerical features
+    scaler = StandardScaler()
+    X_encoded[numerical_cols] = scaler.fit_transform(X_encoded[numerical_cols])
+
+    # Save the NEW encoders
+    with open('route_encoder.pkl', 'wb') as f:
+        pickle.dump(route_encoder, f)
+    with open('stop_encoder.pkl', 'wb') as f:
+        pickle.dump(stop_encoder, f)
+    with open('scaler.pkl', 'wb') as f:
+        pickle.dump(scaler, f)
+
+    X_encoded = X_encoded.to_numpy(dtype=np.float32)
+    y_encoded = y_encoded.astype(np.int32)
+    training_cache.save(cache_key, X_encoded, y_encoded, {
+        'route_encoder.pkl': route_encoder,
+        'stop_encoder.pkl': stop_encoder,
+        'scaler.pkl': scaler
+    }, FEATURE_CONFIG)
 
 print(f"Training samples: {len(X_encoded):,}")
 print(f"Number of unique stops: {len(np.unique(y_encoded))}")
@@ -75,4 +100,5 @@ test_loss, test_accuracy = model.evaluate(X_test, y_test, verbose=0)
 print(f"\nFinal Test Accuracy: {test_accuracy:.4f}")
 
 model.save('bus_predictor.h5')
-print("Model saved as 'bus_predictor.h5'")
\ No newline at end of file
+print("Model saved as 'bus_predictor.h5'")
+print("Run publish_artifacts.py to ship it to the API without a restart")
\ No newline at end of file
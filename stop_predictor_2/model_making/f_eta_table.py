@@ -0,0 +1,154 @@
+#Build stop-to-stop travel time statistics per route and hour bucket from the processed data.
+#The API combines them with the remaining distance to the predicted stop for an O(1) ETA (see api/eta.py).
+#Output: ../data/eta_table.json
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from math import radians, sin, cos, sqrt, atan2
+
+PROCESSED_DATA_PATH = '../data/processed_bus_data.csv'
+STOP_DATABASE_PATH = '../data/stop_database.json'
+OUTPUT_PATH = '../data/eta_table.json'
+
+# Start hour of each bucket: night, morning peak, midday, evening peak, evening (same as api/eta.py)
+HOUR_BUCKET_STARTS = [0, 6, 10, 16, 20]
+# Buckets are in local time, timestamps are UTC epoch seconds (same as api/eta.py)
+TIMEZONE = 'Asia/Kolkata'
+
+# Segments faster/slower than this are GPS glitches or the bus parked
+MIN_SEGMENT_SECONDS = 10
+MAX_SEGMENT_SECONDS = 30 * 60
+# A gap between pings longer than this starts a new trip
+TRIP_GAP_SECONDS = 10 * 60
+# Fewer observations than this are not trusted for a route-specific entry
+MIN_ROUTE_SAMPLES = 3
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two GPS points in meters"""
+    R = 6371000  # Earth radius in meters
+
+    lat1_rad = radians(lat1)
+    lon1_rad = radians(lon1)
+    lat2_rad = radians(lat2)
+    lon2_rad = radians(lon2)
+
+    dlon = lon2_rad - lon1_rad
+    dlat = lat2_rad - lat1_rad
+
+    a = sin(dlat/2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+
+    return R * c
+
+
+def extract_segments(df):
+    """One row per observed stop-to-stop trip: route_id, from_stop, to_stop, seconds, hour_bucket"""
+    group_col = 'vehicle_id' if 'vehicle_id' in df.columns else 'route_id'
+    df = df.sort_values([group_col, 'timestamp']).reset_index(drop=True)
+    same_trip = (df[group_col] == df[group_col].shift()) & \
+                (df['timestamp'].diff() <= TRIP_GAP_SECONDS)
+    df['trip'] = (~same_trip).cumsum()
+
+    # next_stop_id changes right after the bus passes the stop it was heading to
+    changed = same_trip & (df['next_stop_id'] != df['next_stop_id'].shift())
+    arrivals = pd.DataFrame({
+        'trip': df.loc[changed, 'trip'],
+        'route_id': df.loc[changed, 'route_id'],
+        'stop': df['next_stop_id'].shift()[changed],
+        'timestamp': df.loc[changed, 'timestamp'],
+        'hour': df.loc[changed, 'hour']
+    })
+
+    # Consecutive arrivals within a trip are one segment
+    prev = arrivals.groupby('trip').shift()
+    segments = pd.DataFrame({
+        'route_id': arrivals['route_id'],
+        'from_stop': prev['stop'],
+        'to_stop': arrivals['stop'],
+        'seconds': arrivals['timestamp'] - prev['timestamp'],
+        'hour_bucket': np.searchsorted(HOUR_BUCKET_STARTS, prev['hour'].fillna(0), side='right') - 1
+    }).dropna()
+
+    segments = segments[(segments['seconds'] >= MIN_SEGMENT_SECONDS) &
+                        (segments['seconds'] <= MAX_SEGMENT_SECONDS) &
+                        (segments['from_stop'] != segments['to_stop'])]
+    return segments.astype({'route_id': int, 'from_stop': int, 'to_stop': int, 'hour_bucket': int})
+
+
+def segment_distances(segments, stop_database):
+    """Straight-line distance between the two stops of every segment, NaN if a stop has no coordinates"""
+    pairs = segments[['from_stop', 'to_stop']].drop_duplicates()
+    distances = {}
+    for from_stop, to_stop in pairs.itertuples(index=False):
+        a = stop_database.get(str(from_stop))
+        b = stop_database.get(str(to_stop))
+        distances[(from_stop, to_stop)] = (
+            calculate_distance(a['latitude'], a['longitude'], b['latitude'], b['longitude'])
+            if a and b else np.nan
+        )
+    return [distances[pair] for pair in zip(segments['from_stop'], segments['to_stop'])]
+
+
+def summarize(segments, keys, min_samples):
+    """{'k1|k2|...': [median_seconds, distance_m, samples]}"""
+    grouped = segments.groupby(keys).agg(
+        seconds=('seconds', 'median'),
+        distance=('distance', 'first'),
+        samples=('seconds', 'size')
+    ).reset_index()
+    grouped = grouped[grouped['samples'] >= min_samples]
+
+    table = {}
+    for row in grouped.itertuples(index=False):
+        key = '|'.join(str(getattr(row, k)) for k in keys)
+        distance = None if np.isnan(row.distance) else round(float(row.distance), 1)
+        table[key] = [round(float(row.seconds), 1), distance, int(row.samples)]
+    return table
+
+
+def summarize_speeds(segments, keys):
+    """{'k1|...': median speed in m/s} over segments with a known distance"""
+    known = segments.dropna(subset=['distance'])
+    speeds = (known['distance'] / known['seconds']).groupby([known[k] for k in keys]).median()
+    return {
+        '|'.join(map(str, key if isinstance(key, tuple) else (key,))): round(float(speed), 2)
+        for key, speed in speeds.items()
+    }
+
+
+if __name__ == "__main__":
+    print("Loading processed data...")
+    wanted = ['route_id', 'vehicle_id', 'timestamp', 'next_stop_id']
+    df = pd.read_csv(PROCESSED_DATA_PATH, usecols=lambda col: col in wanted)
+    # Always from the timestamp, an older processed file may carry UTC hours
+    df['hour'] = pd.to_datetime(df['timestamp'], unit='s', utc=True).dt.tz_convert(TIMEZONE).dt.hour
+    print(f"Loaded {len(df):,} pings")
+
+    with open(STOP_DATABASE_PATH, 'r') as f:
+        stop_database = json.load(f)
+
+    segments = extract_segments(df)
+    segments['distance'] = segment_distances(segments, stop_database)
+    print(f"Extracted {len(segments):,} stop-to-stop segments")
+
+    eta_table = {
+        'version': 1,
+        'hour_bucket_starts': HOUR_BUCKET_STARTS,
+        'timezone': TIMEZONE,
+        'route_segments': summarize(segments, ['route_id', 'from_stop', 'to_stop', 'hour_bucket'], MIN_ROUTE_SAMPLES),
+        'segments': summarize(segments, ['from_stop', 'to_stop', 'hour_bucket'], 1),
+        'route_speeds': summarize_speeds(segments, ['route_id', 'hour_bucket']),
+        'speeds': summarize_speeds(segments, ['hour_bucket'])
+    }
+    print(f"Route/hour segments: {len(eta_table['route_segments']):,}, "
+          f"any-route segments: {len(eta_table['segments']):,}")
+
+    with open(OUTPUT_PATH, 'w') as f:
+        json.dump(eta_table, f, separators=(',', ':'))
+
+    size_kb = os.path.getsize(OUTPUT_PATH) / 1024
+    print(f"💾 ETA table saved as '{OUTPUT_PATH}' ({size_kb:.1f} KB)")
@@ -0,0 +1,171 @@
+#Train one small model per route cluster instead of one softmax over every stop in the city.
+#Routes are clustered by where they run (KMeans on route centroids), so nearby routes that share
+#stops end up in the same partition. The API loads partitions on demand (see api/partition_registry.py),
+#which removes the need to cut training down to the top 15 routes as a_route_decider.py does.
+#Features are built here from the full master_bus_data.csv, not the top-15 processed_bus_data.csv.
+#Output: ../api/partitions/<cluster>/ + ../api/partitions/index.json
+#
+#  python g_partitioned_training.py                                  # every route in the city
+#  python g_partitioned_training.py --data ../data/bus_data_sampled.csv
+
+import argparse
+import json
+import math
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from sklearn.cluster import KMeans
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+import training_cache
+from d_feature_engineering import create_features
+
+# Raw GPS pings, same columns as the bus_data_sampled.csv that d_feature_engineering.py reads
+DATA_PATH = '../data/master_bus_data.csv'
+OUTPUT_DIR = '../api/partitions'
+# Built here first, the API must never see a half-written set of partitions
+BUILD_DIR = OUTPUT_DIR + '.tmp'
+
+# Target partition size; each output layer then covers roughly this many routes' stops
+ROUTES_PER_CLUSTER = 15
+
+feature_columns = [
+    'latitude', 'longitude', 'route_id', 'speed', 'acceleration',
+    'distance_moved', 'hour', 'is_weekend', 'is_peak_hours',
+    'prev_stop', 'stop_sequence', 'total_stops_in_trip'
+]
+numerical_cols = ['latitude', 'longitude', 'hour', 'distance_moved', 'speed', 'acceleration', 'stop_sequence', 'total_stops_in_trip']
+
+
+def cluster_routes(df):
+    """{route_id: cluster} from KMeans on each route's mean position"""
+    centroids = df.groupby('route_id')[['latitude', 'longitude']].mean()
+    n_clusters = max(1, math.ceil(len(centroids) / ROUTES_PER_CLUSTER))
+    labels = KMeans(n_clusters=n_clusters, n_init=10, random_state=42).fit_predict(centroids.values)
+    return {int(route): int(label) for route, label in zip(centroids.index, labels)}
+
+
+def encode_partition(df, cluster_dir, routes):
+    """Same encoding as e_model_training.py, cached per partition"""
+    config = {
+        'pipeline': 'g_partitioned_training',
+        'routes': sorted(routes),
+        'features': feature_columns,
+        'numerical': numerical_cols,
+        'target': 'next_stop_id'
+    }
+    key = training_cache.cache_key(df[feature_columns + ['next_stop_id']], config)
+    cached = training_cache.load(key, encoder_dir=cluster_dir)
+    if cached is not None:
+        return cached
+
+    route_encoder = LabelEncoder()
+    stop_encoder = LabelEncoder()
+
+    X_encoded = df[feature_columns].copy()
+    X_encoded['route_id'] = route_encoder.fit_transform(X_encoded['route_id'])
+    X_encoded['prev_stop'] = stop_encoder.fit_transform(X_encoded['prev_stop'].astype(str))
+    y_encoded = stop_encoder.fit_transform(df['next_stop_id'])
+
+    scaler = StandardScaler()
+    X_encoded[numerical_cols] = scaler.fit_transform(X_encoded[numerical_cols])
+
+    encoders = {
+        'route_encoder.pkl': route_encoder,
+        'stop_encoder.pkl': stop_encoder,
+        'scaler.pkl': scaler
+    }
+    for name, encoder in encoders.items():
+        with open(os.path.join(cluster_dir, name), 'wb') as f:
+            pickle.dump(encoder, f)
+
+    X_encoded = X_encoded.to_numpy(dtype=np.float32)
+    y_encoded = y_encoded.astype(np.int32)
+    training_cache.save(key, X_encoded, y_encoded, encoders, config)
+    return X_encoded, y_encoded
+
+
+def train_partition(X, y):
+    """Smaller network than the city-wide model, its output layer only covers this cluster's stops"""
+    num_stops = len(np.unique(y))
+    # Stops seen once can't be stratified
+    counts = np.bincount(y)
+    stratify = y if counts[counts > 0].min() >= 2 else None
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=stratify
+    )
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Dense(128, activation='relu', input_shape=(X_train.shape[1],)),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(64, activation='relu'),
+        tf.keras.layers.Dense(num_stops, activation='softmax')
+    ])
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    model.fit(X_train, y_train, epochs=30, batch_size=64, validation_data=(X_test, y_test), verbose=0)
+
+    _, test_accuracy = model.evaluate(X_test, y_test, verbose=0)
+    return model, test_accuracy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train one model per route cluster')
+    parser.add_argument('--data', default=DATA_PATH, help=f'raw GPS CSV (default: {DATA_PATH})')
+    args = parser.parse_args()
+
+    print(f"Loading {args.data}...")
+    df = create_features(pd.read_csv(args.data))
+    df['prev_stop'] = df['prev_stop'].fillna(0).astype(int)
+    print(f"Loaded {len(df):,} rows, {df['route_id'].nunique()} routes")
+
+    route_to_cluster = cluster_routes(df)
+    df['cluster'] = df['route_id'].map(route_to_cluster)
+    print(f"Grouped routes into {df['cluster'].nunique()} clusters")
+
+    shutil.rmtree(BUILD_DIR, ignore_errors=True)
+
+    clusters = {}
+    for cluster, cluster_df in df.groupby('cluster'):
+        routes = sorted(int(r) for r in cluster_df['route_id'].unique())
+        cluster_dir = os.path.join(BUILD_DIR, str(cluster))
+        os.makedirs(cluster_dir)
+
+        X, y = encode_partition(cluster_df, cluster_dir, routes)
+        model, accuracy = train_partition(X, y)
+        model.save(os.path.join(cluster_dir, 'bus_predictor.h5'))
+
+        # Same stops the partition's stop encoder was fit on, the API only routes these here
+        stop_ids = sorted(int(s) for s in cluster_df['next_stop_id'].unique())
+        clusters[str(cluster)] = {
+            'routes': routes,
+            'stop_ids': stop_ids,
+            'stops': len(stop_ids),
+            'rows': int(len(cluster_df)),
+            'params': int(model.count_params()),
+            'test_accuracy': round(float(accuracy), 4)
+        }
+        print(f"✅ Cluster {cluster}: {len(routes)} routes, {clusters[str(cluster)]['stops']} stops, "
+              f"accuracy {accuracy:.4f}")
+
+    # Requests without a route_id are routed by their nearest stop: pick the cluster
+    # and route that see that stop most often
+    stop_counts = df.groupby(['next_stop_id', 'cluster', 'route_id']).size().reset_index(name='count')
+    best = stop_counts.sort_values('count', ascending=False).drop_duplicates('next_stop_id')
+    stops = {str(int(row.next_stop_id)): [str(int(row.cluster)), int(row.route_id)]
+             for row in best.itertuples()}
+
+    with open(os.path.join(BUILD_DIR, 'index.json'), 'w') as f:
+        json.dump({
+            'routes': {str(route): str(cluster) for route, cluster in route_to_cluster.items()},
+            'stops': stops,
+            'clusters': clusters
+        }, f, indent=2)
+
+    shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+    os.rename(BUILD_DIR, OUTPUT_DIR)
+    print(f"💾 Saved {len(clusters)} partitioned models to '{OUTPUT_DIR}'")
+    print("Restart the API to pick up the new partitions")
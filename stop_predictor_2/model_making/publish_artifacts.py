@@ -0,0 +1,105 @@
+#Publish the model and encoders written by e_model_training.py as a new version in ../api/artifacts.
+#The running API picks the change up from artifacts/manifest.json without a restart (see api/model_store.py);
+#under api/serve.py a new active version triggers a rolling restart of the workers instead, and only
+#one worker shadow-scores, so the fraction applies to that worker's share of the traffic.
+#
+#  python publish_artifacts.py                      # publish and make it the active version
+#  python publish_artifacts.py --shadow 0.1         # publish as candidate, shadow-score 10% of traffic
+#  python publish_artifacts.py --promote <version>  # make an already published version active
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+ARTIFACTS_DIR = '../api/artifacts'
+MANIFEST_NAME = 'manifest.json'
+ARTIFACT_FILES = ['bus_predictor.h5', 'route_encoder.pkl', 'stop_encoder.pkl', 'scaler.pkl']
+STOP_DATABASE_PATH = '../data/stop_database.json'
+# Optional, built by f_eta_table.py
+ETA_TABLE_PATH = '../data/eta_table.json'
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data):
+    """Readers never see a half-written manifest"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_top_manifest():
+    path = os.path.join(ARTIFACTS_DIR, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'active': None, 'candidate': None, 'shadow_fraction': 0.0}
+
+
+def publish_version(version):
+    version_dir = os.path.join(ARTIFACTS_DIR, version)
+    if os.path.exists(version_dir):
+        raise SystemExit(f"❌ Version {version} already exists")
+
+    # Copy into a temp dir first so a half-copied version is never visible
+    tmp_dir = version_dir + '.tmp'
+    os.makedirs(tmp_dir)
+    for name in ARTIFACT_FILES:
+        shutil.copy2(name, os.path.join(tmp_dir, name))
+    shutil.copy2(STOP_DATABASE_PATH, os.path.join(tmp_dir, 'stop_database.json'))
+    data_files = ['stop_database.json']
+    if os.path.exists(ETA_TABLE_PATH):
+        shutil.copy2(ETA_TABLE_PATH, os.path.join(tmp_dir, 'eta_table.json'))
+        data_files.append('eta_table.json')
+
+    files = {name: file_sha256(os.path.join(tmp_dir, name))
+             for name in ARTIFACT_FILES + data_files}
+    write_json_atomic(os.path.join(tmp_dir, MANIFEST_NAME), {
+        'version': version,
+        'created_at': datetime.now().isoformat(),
+        'files': files
+    })
+    os.rename(tmp_dir, version_dir)
+    print(f"✅ Published version {version} to {version_dir}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Publish trained model artifacts for the API')
+    parser.add_argument('--version', default=datetime.now().strftime('%Y%m%d-%H%M%S'))
+    parser.add_argument('--shadow', type=float, metavar='FRACTION',
+                        help='publish as candidate and shadow-score this fraction of requests')
+    parser.add_argument('--promote', metavar='VERSION',
+                        help='make an already published version active')
+    args = parser.parse_args()
+
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    manifest = read_top_manifest()
+
+    if args.promote:
+        if not os.path.isdir(os.path.join(ARTIFACTS_DIR, args.promote)):
+            raise SystemExit(f"❌ Version {args.promote} has not been published")
+        manifest['active'] = args.promote
+        if manifest.get('candidate') == args.promote:
+            manifest['candidate'] = None
+            manifest['shadow_fraction'] = 0.0
+    else:
+        publish_version(args.version)
+        if args.shadow is not None and manifest.get('active'):
+            manifest['candidate'] = args.version
+            manifest['shadow_fraction'] = args.shadow
+        else:
+            manifest['active'] = args.version
+
+    write_json_atomic(os.path.join(ARTIFACTS_DIR, MANIFEST_NAME), manifest)
+    print(f"📋 Active: {manifest['active']}, candidate: {manifest.get('candidate')} "
+          f"(shadow {manifest.get('shadow_fraction', 0.0):.0%})")
@@ -0,0 +1,80 @@
+#Cache of encoded + scaled training matrices so repeated training runs skip CSV parsing and encoder fitting.
+#
+#Each entry lives in ../data/cache/<key>/ where key = sha256(input data + feature config):
+#  X.npy (float32), y.npy (int32)   loaded with mmap_mode='r', so nothing is copied until used
+#  *.pkl                            the fitted encoders/scaler, copied back next to the script on a hit
+#  meta.json                        columns, shapes and the config the entry was built with
+#Changing the data or the feature config changes the key, so stale entries are simply never hit.
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = '../data/cache'
+
+
+def cache_key(source, config):
+    """Hash of the input (CSV path -> file bytes, DataFrame -> cell values) and the feature config"""
+    digest = hashlib.sha256()
+    if isinstance(source, pd.DataFrame):
+        digest.update(pd.util.hash_pandas_object(source, index=False).values.tobytes())
+        digest.update(','.join(map(str, source.columns)).encode())
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def load(key, encoder_dir='.'):
+    """Return memory-mapped (X, y) for this key, or None on a miss"""
+    entry_dir = os.path.join(CACHE_DIR, key)
+    meta_path = os.path.join(entry_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+
+    # Keep the encoders on disk in sync with the cached matrices
+    for name in meta['encoders']:
+        shutil.copy2(os.path.join(entry_dir, name), os.path.join(encoder_dir, name))
+
+    X = np.load(os.path.join(entry_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(entry_dir, 'y.npy'), mmap_mode='r')
+    print(f"⚡ Loaded cached training matrix {key}: X {X.shape}, y {y.shape}")
+    return X, y
+
+
+def save(key, X, y, encoders, config):
+    """Store float32 X, int32 y and the fitted encoders ({filename: object}) under this key"""
+    entry_dir = os.path.join(CACHE_DIR, key)
+    tmp_dir = entry_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.ascontiguousarray(y, dtype=np.int32)
+    np.save(os.path.join(tmp_dir, 'X.npy'), X)
+    np.save(os.path.join(tmp_dir, 'y.npy'), y)
+    for name, encoder in encoders.items():
+        with open(os.path.join(tmp_dir, name), 'wb') as f:
+            pickle.dump(encoder, f)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'x_shape': list(X.shape),
+            'y_shape': list(y.shape),
+            'encoders': sorted(encoders),
+            'config': config
+        }, f, indent=2)
+
+    # A crashed run never leaves a half-written entry behind
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.rename(tmp_dir, entry_dir)
+    print(f"💾 Cached training matrix as {key}")